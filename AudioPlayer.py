@@ -1,36 +1,125 @@
+import os
 from pathlib import Path
+from threading import Event, Lock, Thread
+from typing import Optional, Callable
 
-import vlc
+from audio.IAudioBackend import IAudioBackend
 
 
 class AudioPlayer:
     """
-    Wrapper around VLC, which has to be installed on the system for this to work.
+    Plays audio files at a level corrected by their gain level. The audio output itself is done by a backend, VLC by
+    default, which has to be installed on the system for this to work.
+
+    The next track can be prepared ahead of time: the backend prepares it, e.g. VLC parses it, and the file is read
+    once, so the drive has spun up and the file's content is in the page cache when the track is played. Small files
+    are read completely, of larger ones only the start, which keeps the prefetching within a RAM budget.
+
+    Attributes:
+        backend             The backend that outputs the audio
+        prefetch_budget     Files up to this size in bytes are prefetched completely
+        prefetch_head       Number of bytes prefetched of larger files, enough for the first seconds
     """
-    vlcInstance: vlc.Instance = vlc.Instance()
-    player: vlc.MediaPlayer
-    eq: vlc.AudioEqualizer
+    backend: IAudioBackend
+
+    prefetch_budget: int = 32 * 2 ** 20
+    prefetch_head: int = 2 ** 20
+
+    __prepared_file: Optional[Path] = None
+    __prefetch_cancelled: Optional[Event] = None
+    # Keeps the prefetch thread from preparing the backend while the file is being played or dropped
+    __lock: Lock
 
-    def __init__(self):
-        self.player = self.vlcInstance.media_player_new()
-        self.eq = vlc.AudioEqualizer()
-        self.player.set_equalizer(self.eq)
+    def __init__(self, backend: Optional[IAudioBackend] = None):
+        self.__lock = Lock()
+        if backend is None:
+            # Only imported when needed, so other backends work without VLC
+            from audio.VlcAudioBackend import VlcAudioBackend
+            backend = VlcAudioBackend()
+        self.backend = backend
+
+    def prepare(self, file: Path, delay: float = 0.0):
+        """
+        Prepares a file for playing it next, replacing an earlier prepared file.
+        The prefetching runs in the background, so this returns right away.
+        :param file: The path of the file
+        :param delay: Seconds to wait before prefetching, so it doesn't compete with the start of a playing file
+        :return: None
+        """
+        self.drop_prepared()
+        cancelled = Event()
+        with self.__lock:
+            self.__prepared_file = file
+            self.__prefetch_cancelled = cancelled
+        Thread(target=self.__prefetch, args=(file, cancelled, delay), name="prefetch", daemon=True).start()
+
+    def __prefetch(self, file: Path, cancelled: Event, delay: float):
+        if cancelled.wait(delay):
+            return
+        try:
+            with open(file, 'rb', buffering=0) as file_handle:
+                size = os.fstat(file_handle.fileno()).st_size
+                budget = size if size <= self.prefetch_budget else self.prefetch_head
+                # Let the backend prepare as soon as the start of the file is in the page cache, the rest is read
+                # meanwhile
+                self.__read(file_handle, min(budget, self.prefetch_head), cancelled)
+                with self.__lock:
+                    if cancelled.is_set():
+                        return
+                    self.backend.prepare(file)
+                self.__read(file_handle, budget - self.prefetch_head, cancelled)
+        except:
+            print("Exception prefetching " + file.__str__())
+
+    @staticmethod
+    def __read(file_handle, count: int, cancelled: Event):
+        # The data itself isn't needed, reading it just puts it into the page cache
+        buffer = bytearray(2 ** 18)
+        while count > 0 and not cancelled.is_set():
+            read = file_handle.readinto(buffer)
+            if not read:
+                return
+            count -= read
+
+    def get_prepared(self) -> Optional[Path]:
+        """:return: The path of the prepared file, if any"""
+        return self.__prepared_file
+
+    def drop_prepared(self, root_path: Optional[Path] = None):
+        """
+        Drops the prepared file, e.g. because its drive has been removed
+        :param root_path: Only drop the prepared file if it's below this path
+        :return: None
+        """
+        with self.__lock:
+            if self.__prepared_file is None:
+                return
+            if root_path is not None and root_path.absolute() not in self.__prepared_file.absolute().parents:
+                return
+            self.__prefetch_cancelled.set()
+            self.__prepared_file = None
+            self.__prefetch_cancelled = None
+            self.backend.drop_prepared()
 
-    def play(self, file: Path, level: float):
+    def play(self, file: Path, level: float, on_playing: Optional[Callable[[], None]] = None):
         """
-        Plays an audio file with VLC.
-        The gain level on VLC's preamp is set such that the resulting gain level of the file is +5dB.
+        Plays an audio file.
+        The gain level on the backend's preamp is set such that the resulting gain level of the file is +5dB.
         The most important effect of this is that all files sound roughly just as loud as each other.
         The rather high level of +5dB is due to the Rpi having a really low level headphone output.
         :param file: The path of the file to play
         :param level: The gain level to assume for this file
+        :param on_playing: Called from a backend thread once the backend has actually started playing the file
         :return:
         """
-        self.eq.set_preamp(-level - 15)
-        self.player.set_equalizer(self.eq)
-        self.player.audio_set_volume(100)
-        self.player.set_media(vlc.Media(file.__str__()))
-        self.player.play()
+        with self.__lock:
+            if file == self.__prepared_file:
+                # The backend reads the file on its own from now on, and a prefetch that hasn't prepared it yet
+                # mustn't do so after it has started playing
+                self.__prefetch_cancelled.set()
+                self.__prepared_file = None
+                self.__prefetch_cancelled = None
+        self.backend.play(file, -level - 15, on_playing)
 
     def stop(self):
-        self.player.stop()
+        self.backend.stop()
@@ -1,37 +1,144 @@
 import multiprocessing as mp
 import time
+from multiprocessing.connection import Connection
+from pathlib import Path
+from typing import Optional, Dict
 
-from bmp280.BMP280_I2C import BMP280_I2C
+from helpers.BootTimeline import BootPhase
+from input.IPressureSensor import IPressureSensor
 from input.PressureInput import PressureInput
-from input.SipPuffEvent import SipPuffEvent, SipPuffListener
+from input.PressureRecording import RecordingPressureSensor
+from input.SipPuffEvent import SipPuffEvent, SipPuffListener, SipPuffMessage
 
 
-class InputWorker(mp.Process, SipPuffListener):
+class InputChannel(SipPuffListener):
+    """
+    A single sensor with its own input state machine.
+    Its events are sent through the output connection of the worker, tagged with the channel's name.
+    """
+    name: str
+    pressure_input: PressureInput
+    sample_period: float
+    next_sample: float = 0.0
+    last_read_time: float = 0.0  # Monotonic time of the last sensor reading, for tracing
+
+    __output_connection: Connection
+
+    def __init__(self, name: str, pressure_input: PressureInput, sample_period: float,
+                 output_connection: Connection):
+        self.name = name
+        self.pressure_input = pressure_input
+        self.sample_period = sample_period
+        self.__output_connection = output_connection
+        pressure_input.register_listener(self)
+
+    def handle_sip_puff_event(self, event: SipPuffEvent) -> None:
+        message = SipPuffMessage(event, self.name)
+        message.stamp("sensor_read", self.last_read_time)
+        message.stamp("detected")
+        self.__output_connection.send(message)
+
+
+class InputWorker(mp.Process):
     """
     This worker basically handles the sip-puff input.
-    Input events are put into the output queue from which they have to be read.
+    It can handle several sensors, each with its own input state machine, in a single loop.
+    Input events are sent through a pipe, whose receiving end is the connection attribute.
+    The ends of the startup phases of the worker are sent through it as BootPhase messages.
     """
-    output_queue: mp.Queue
+    connection: Connection
+    __output_connection: Connection
+
+    __sensors: Optional[Dict[str, IPressureSensor]]
+    __record_path: Optional[Path]
+    __channels: [InputChannel]
 
-    __sensor: BMP280_I2C
-    __pressure_input: PressureInput
+    # Lower bound for the time between two samples in seconds
+    min_sample_period: float = 0.01
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, sensors: Optional[Dict[str, IPressureSensor]] = None,
+                 record_path: Optional[Path] = None, **kwargs):
+        """
+        :param sensors: The sensors to handle by name. Defaults to a single BMP280 on I2C bus 1, which is created and
+                        configured in the worker process, so the main process doesn't need to wait for it.
+        :param record_path: If given, all readings are recorded into a new pressure log at this path. With several
+                            sensors, the sensor name is appended to the file name.
+        """
         super().__init__(*args, **kwargs)
-        self.output_queue = mp.Queue()
+        self.connection, self.__output_connection = mp.Pipe(duplex=False)
         self.daemon = True
 
-        self.__sensor = BMP280_I2C.create_default()
-        self.__pressure_input = PressureInput(self.__sensor)
-        self.__pressure_input.register_listener(self)
+        self.__sensors = sensors
+        self.__record_path = record_path
+        self.__channels = []
+
+    def __create_channels(self):
+        sensors = self.__sensors
+        if sensors is None:
+            # Only imported in the worker process, the main process has no use for the I2C bus
+            from bmp280.BMP280_I2C import BMP280_I2C
+            sensors = {"i2c-1-0x76": BMP280_I2C.create_default()}
+
+        record_path = self.__record_path
+        for name, sensor in sensors.items():
+            if record_path is not None:
+                log_path = record_path
+                if len(sensors) > 1:
+                    log_path = record_path.with_name(record_path.stem + "_" + name + record_path.suffix)
+                sensor = RecordingPressureSensor(sensor, log_path)
+            self.__channels.append(InputChannel(name, PressureInput(sensor), self.get_sample_period(sensor),
+                                                self.__output_connection))
+
+        # Sorted by bus, so sensors on the same bus are read back to back
+        self.__channels.sort(key=lambda c: c.pressure_input.get_sensor().get_bus_name() or "")
+
+    def get_sample_period(self, sensor: IPressureSensor) -> float:
+        """
+        Sampling faster than the chip produces measurements would only read the same values again,
+        so the period is matched to the chip's output data rate.
+        :return: The time between two samples in seconds
+        """
+        chip_period = sensor.get_sample_period()
+        if chip_period is None:
+            return self.min_sample_period
+        return max(self.min_sample_period, chip_period)
 
     def run(self):
+        self.__create_channels()
+        self.__output_connection.send(BootPhase("sensors_configured"))
+        first_sample = True
+
+        start = time.perf_counter()
+        for channel in self.__channels:
+            channel.next_sample = start
+
         while True:
-            try:
-                time.sleep(0.01)
-                self.__pressure_input.update()
-            except:
-                print("Exception in Input worker")
+            # Sleep until the next sample of any sensor is due
+            next_sample = min(channel.next_sample for channel in self.__channels)
+            time.sleep(max(0.0, next_sample - time.perf_counter()))
+            now = time.perf_counter()
 
-    def handle_sip_puff_event(self, event: SipPuffEvent) -> None:
-        self.output_queue.put(event)
+            # Take the readings of all due sensors first and process them afterwards, which keeps the bus
+            # accesses close together
+            readings = []
+            for channel in self.__channels:
+                if channel.next_sample > now:
+                    continue
+                # If we fell behind, we don't try to catch up
+                channel.next_sample = max(channel.next_sample + channel.sample_period, now)
+                try:
+                    value = channel.pressure_input.get_sensor().get_pressure_in_Pascal()
+                    readings.append((channel, value, channel.pressure_input.get_clock()(), time.monotonic()))
+                except:
+                    print("Exception reading sensor " + channel.name + " in Input worker")
+
+            for channel, value, timestamp, read_time in readings:
+                try:
+                    channel.last_read_time = read_time
+                    channel.pressure_input.process(value, timestamp)
+                except:
+                    print("Exception processing sensor " + channel.name + " in Input worker")
+
+            if first_sample and readings:
+                first_sample = False
+                self.__output_connection.send(BootPhase("first_sample", readings[0][3]))
@@ -1,10 +1,14 @@
+import os
+import random
 import sys
+from array import array
 from pathlib import Path
-import random
 from typing import Optional
 
 
 class DbEntry:
+    __slots__ = ["path", "gain_level"]
+
     path: Path
     gain_level: float
 
@@ -13,30 +17,202 @@ class DbEntry:
         self.gain_level = gain_level
 
 
+class RootEntries:
+    """
+    The entries of a single root path in parallel arrays.
+
+    Every directory is stored once and entries refer to it by index, the file names are stored in one blob of file
+    system encoded bytes and the gain levels as 32 bit floats. This takes a few dozen bytes per entry instead of a
+    Path and a DbEntry object, which adds up with hundreds of thousands of files.
+
+    Entries are found by path by comparing the names within their directory. Directories with more than
+    index_threshold entries get a dict from encoded name to entry index instead, so finding an entry in a flat folder
+    with thousands of files doesn't scan all of them, while album sized folders don't pay for a dict.
+    """
+    __slots__ = ["__directories", "__directory_ids", "__directory_entries", "__directory_indices",
+                 "__entry_directories", "__names", "__name_offsets", "__gain_levels"]
+
+    index_threshold: int = 32
+
+    def __init__(self):
+        self.__directories: [str] = []
+        self.__directory_ids: {str: int} = {}
+        self.__directory_entries: [array] = []  # Entry indices per directory, for finding entries by path
+        self.__directory_indices: {int: {bytes: int}} = {}  # Entry indices by name of the large directories
+        self.__entry_directories = array('I')
+        self.__names = bytearray()
+        self.__name_offsets = array('Q', [0])
+        self.__gain_levels = array('f')
+
+    def __len__(self) -> int:
+        return len(self.__gain_levels)
+
+    def add(self, directory: str, name: str, gain_level: float) -> int:
+        """
+        :param directory: The absolute path of the file's directory
+        :param name: The file name
+        :param gain_level: The file's gain level
+        :return: The index of the new entry
+        """
+        directory_id = self.__directory_ids.get(directory)
+        if directory_id is None:
+            directory_id = len(self.__directories)
+            self.__directories.append(directory)
+            self.__directory_ids[directory] = directory_id
+            self.__directory_entries.append(array('I'))
+
+        index = len(self.__gain_levels)
+        encoded = os.fsencode(name)
+        directory_entries = self.__directory_entries[directory_id]
+        directory_entries.append(index)
+        self.__entry_directories.append(directory_id)
+        self.__names += encoded
+        self.__name_offsets.append(len(self.__names))
+        self.__gain_levels.append(gain_level)
+
+        directory_index = self.__directory_indices.get(directory_id)
+        if directory_index is not None:
+            directory_index[encoded] = index
+        elif len(directory_entries) > self.index_threshold:
+            self.__directory_indices[directory_id] = {self.__get_name(i): i for i in directory_entries}
+        return index
+
+    def __get_name(self, index: int) -> bytes:
+        return bytes(self.__names[self.__name_offsets[index]:self.__name_offsets[index + 1]])
+
+    def find(self, directory: str, name: str) -> Optional[int]:
+        """:return: The index of the entry or None if there's no such file"""
+        directory_id = self.__directory_ids.get(directory)
+        if directory_id is None:
+            return None
+        encoded = os.fsencode(name)
+        directory_index = self.__directory_indices.get(directory_id)
+        if directory_index is not None:
+            return directory_index.get(encoded)
+        for index in self.__directory_entries[directory_id]:
+            if self.__names[self.__name_offsets[index]:self.__name_offsets[index + 1]] == encoded:
+                return index
+        return None
+
+    def get(self, index: int) -> DbEntry:
+        name = os.fsdecode(self.__get_name(index))
+        directory = self.__directories[self.__entry_directories[index]]
+        return DbEntry(Path(directory, name), self.__gain_levels[index])
+
+    def get_gain_level(self, index: int) -> float:
+        return self.__gain_levels[index]
+
+    def set_gain_level(self, index: int, gain_level: float):
+        self.__gain_levels[index] = gain_level
+
+
 class MusicDB:
     """
     Class for storing information about the available music.
+
+    The entries are kept per root path, so removing a drive drops all of its entries at once. Adding an entry finds
+    its root path by looking up the file's parent directories, and a random entry is picked by choosing a root path
+    and an index, so neither depends on the number of entries.
     """
-    __data: {str: [DbEntry]} = {}
+    __roots: {str: RootEntries}
+    __roots_with_content: [str]  # Kept up to date for picking a random root path
+
+    def __init__(self):
+        self.__roots = {}
+        self.__roots_with_content = []
+
+    @staticmethod
+    def get_root_key(path: Path) -> str:
+        return path.absolute().__str__()
 
     def add_root_path(self, path: Path):
-        self.__data[path.absolute().__str__()] = []
+        self.remove_root_path(path)
+        self.__roots[self.get_root_key(path)] = RootEntries()
 
     def remove_root_path(self, path: Path):
-        del self.__data[path.absolute().__str__()]
+        key = self.get_root_key(path)
+        self.__roots.pop(key, None)
+        if key in self.__roots_with_content:
+            self.__roots_with_content.remove(key)
+
+    def __find_root(self, directory: str) -> Optional[str]:
+        # The innermost root path wins, like for nested mount points
+        while True:
+            if directory in self.__roots:
+                return directory
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return None
+            directory = parent
+
+    def add_entry(self, path: Path, gain_level: float) -> Optional[tuple]:
+        """
+        :param path: The path of the file
+        :param gain_level: The gain level of the file
+        :return: The root path key and index of the new entry, for get_entry, or None if the file isn't on a known
+                 root path
+        """
+        directory, name = os.path.split(path.absolute().__str__())
+        root = self.__find_root(directory)
+        if root is None:
+            sys.stderr.write("Root path for file not yet added: " + path.__str__() + "\n")
+            return None
+        entries = self.__roots[root]
+        index = entries.add(directory, name, gain_level)
+        if len(entries) == 1:
+            self.__roots_with_content.append(root)
+        return root, index
+
+    def get_entry(self, root: str, index: int) -> Optional[DbEntry]:
+        """
+        :param root: The root path key as returned by add_entry
+        :param index: The index as returned by add_entry
+        :return: The entry or None if its root path has been removed
+        """
+        entries = self.__roots.get(root)
+        if entries is None or index >= len(entries):
+            return None
+        return entries.get(index)
+
+    def get_entry_counts(self) -> {str: int}:
+        """:return: The number of entries by root path key"""
+        return {root: len(entries) for root, entries in self.__roots.items()}
+
+    def update_gain_level(self, path: Path, gain_level: float):
+        """
+        Replaces the gain level of an entry, e.g. a provisional one after the file has been analyzed.
+        Files that aren't known (anymore) are ignored, their root path has probably been removed in the meantime.
+        :param path: The path of the entry
+        :param gain_level: The new gain level
+        :return: None
+        """
+        directory, name = os.path.split(path.absolute().__str__())
+        root = self.__find_root(directory)
+        if root is None:
+            return
+        index = self.__roots[root].find(directory, name)
+        if index is not None:
+            self.__roots[root].set_gain_level(index, gain_level)
+
+    def get_gain_level(self, path: Path) -> Optional[float]:
+        """
+        :param path: The path of the entry
+        :return: The current gain level of the entry or None if the file isn't known (anymore)
+        """
+        directory, name = os.path.split(path.absolute().__str__())
+        root = self.__find_root(directory)
+        if root is None:
+            return None
+        index = self.__roots[root].find(directory, name)
+        if index is None:
+            return None
+        return self.__roots[root].get_gain_level(index)
 
-    def add_entry(self, path: Path, gain_level: float):
-        for key in self.__data:
-            if path.absolute().__str__().startswith(key):
-                self.__data[key].append(DbEntry(path, gain_level))
-                return
-        sys.stderr.write("Root path for file not yet added: " + path.__str__() + "\n")
+    def get_entry_count(self) -> int:
+        return sum(len(entries) for entries in self.__roots.values())
 
     def get_random_entry(self) -> Optional[DbEntry]:
-        allKeys = list(self.__data.keys())
-        keysWithContent = [k for k in allKeys if len(self.__data[k]) > 0]
-        if not keysWithContent:
+        if not self.__roots_with_content:
             return None
-        key = random.choice(keysWithContent)
-        entry = random.choice(self.__data[key])
-        return entry
+        entries = self.__roots[random.choice(self.__roots_with_content)]
+        return entries.get(random.randrange(len(entries)))
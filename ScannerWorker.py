@@ -1,5 +1,11 @@
 import multiprocessing as mp
+from multiprocessing.connection import Connection
+from typing import Optional
 
+from helpers.BootTimeline import BootPhase
+from scanner.GainCache import GainCache
+from scanner.MountWatcher import MountWatcher
+from scanner.ScannerEventBatcher import ScannerEventBatcher
 from scanner.ScannerEvents import ScannerEventHandler, ScannerEvent
 from scanner.UsbRootScanner import Scanner
 
@@ -7,19 +13,28 @@ from scanner.UsbRootScanner import Scanner
 class ScannerWorker(mp.Process, ScannerEventHandler):
     """
     This worker handles the scanning of thumbdrives for music.
-    Information about the results is put into the output queue, from which it has to be read.
+    Information about the results is sent through a pipe, whose receiving end is the connection attribute.
     """
-    output_queue: mp.Queue
-    __scanner: Scanner
+    connection: Connection
+    __output_connection: Connection
+    __scanner: Optional[Scanner]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.output_queue = mp.Queue()
+        self.connection, self.__output_connection = mp.Pipe(duplex=False)
         self.daemon = True
 
-        self.__scanner = Scanner(self)
+        # Created in the worker process, since the mount watcher keeps the mountinfo file open
+        self.__scanner = None
+
+    def __create_scanner(self) -> Scanner:
+        # Found files are sent in batches, which saves a lot of pickling and wakeups for large drives
+        mount_watcher = MountWatcher() if MountWatcher.is_supported() else None
+        return Scanner(ScannerEventBatcher(self), gain_cache=GainCache(), mount_watcher=mount_watcher)
 
     def run(self):
+        self.__scanner = self.__create_scanner()
+        self.__output_connection.send(BootPhase("scanner_ready"))
         while True:
             try:
                 self.__scanner.work_loop()
@@ -27,4 +42,4 @@ class ScannerWorker(mp.Process, ScannerEventHandler):
                 print("Exception in Scanner worker")
 
     def handle_scanner_event(self, event: ScannerEvent):
-        self.output_queue.put(event)
+        self.__output_connection.send(event)
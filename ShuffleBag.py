@@ -0,0 +1,89 @@
+import random
+from array import array
+from enum import Enum
+from pathlib import Path
+from typing import Optional
+
+from MusicDB import MusicDB, DbEntry
+
+
+class Weighting(Enum):
+    """How the next track is chosen among the tracks that haven't been played in the current cycle"""
+    PER_TRACK = 1  # Every track is equally likely, so large drives get played more often
+    PER_ROOT = 2  # Every drive is equally likely, no matter how many tracks it has
+
+
+class ShuffleBag:
+    """
+    Playback order on top of a MusicDB that doesn't repeat a track before all others have been played.
+
+    Every root path has a bag with the indices of its entries that haven't been played in the current cycle. A track
+    is drawn by picking a root path according to the weighting and swapping a random index of its bag with the last
+    one before removing it. New entries are put into their root path's bag right away, so they can be played in the
+    running cycle, and removing a root path just drops its bag. Once all bags are empty, they're refilled and the next
+    cycle starts. Nothing of this reshuffles the whole library, the refill costs a constant amount per played track.
+
+    Add and remove root paths and entries through the bag, it passes them on to the MusicDB.
+    """
+    weighting: Weighting
+
+    __mdb: MusicDB
+    __bags: {str: array}
+    __last: Optional[tuple] = None
+
+    def __init__(self, mdb: MusicDB, weighting: Weighting = Weighting.PER_TRACK):
+        self.__mdb = mdb
+        self.__bags = {}
+        self.weighting = weighting
+
+    def add_root_path(self, path: Path):
+        self.__mdb.add_root_path(path)
+        self.__bags[MusicDB.get_root_key(path)] = array('I')
+
+    def remove_root_path(self, path: Path):
+        self.__mdb.remove_root_path(path)
+        self.__bags.pop(MusicDB.get_root_key(path), None)
+
+    def add_entry(self, path: Path, gain_level: float):
+        handle = self.__mdb.add_entry(path, gain_level)
+        if handle is not None:
+            root, index = handle
+            self.__bags[root].append(index)
+
+    def __refill(self):
+        for root, count in self.__mdb.get_entry_counts().items():
+            self.__bags[root] = array('I', range(count))
+
+    def __draw(self) -> Optional[tuple]:
+        roots = [root for root, bag in self.__bags.items() if bag]
+        if not roots:
+            return None
+        if self.weighting == Weighting.PER_ROOT:
+            root = random.choice(roots)
+        else:
+            root = random.choices(roots, weights=[len(self.__bags[root]) for root in roots])[0]
+
+        bag = self.__bags[root]
+        position = random.randrange(len(bag))
+        bag[position], bag[-1] = bag[-1], bag[position]
+        return root, bag.pop()
+
+    def get_next_entry(self) -> Optional[DbEntry]:
+        """
+        :return: The next track to play or None if there's no music at all
+        """
+        handle = self.__draw()
+        if handle is None:
+            self.__refill()
+            handle = self.__draw()
+            # Don't play the last track of a cycle again as first one of the next
+            if handle is not None and handle == self.__last:
+                replacement = self.__draw()
+                if replacement is not None:
+                    self.__bags[handle[0]].append(handle[1])
+                    handle = replacement
+        if handle is None:
+            return None
+
+        self.__last = handle
+        return self.__mdb.get_entry(*handle)
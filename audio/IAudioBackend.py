@@ -0,0 +1,35 @@
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, Callable
+
+
+class IAudioBackend(ABC):
+    """Interface for whatever actually outputs the audio of the AudioPlayer"""
+
+    @abstractmethod
+    def play(self, file: Path, preamp: float, on_playing: Optional[Callable[[], None]] = None):
+        """
+        Starts playing a file, replacing whatever is playing
+        :param file: The file to play
+        :param preamp: The amplification in dB to apply
+        :param on_playing: Called, possibly from another thread, once the audio has actually started
+        :return: None
+        """
+        pass
+
+    @abstractmethod
+    def stop(self):
+        pass
+
+    def prepare(self, file: Path):
+        """
+        Backends that can open or parse a file ahead of time do so here. The file is usually played next, but may
+        also just be dropped again.
+        :param file: The file to prepare
+        :return: None
+        """
+        pass
+
+    def drop_prepared(self):
+        """Forgets the prepared file, e.g. because its drive has been removed"""
+        pass
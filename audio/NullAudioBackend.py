@@ -0,0 +1,86 @@
+import time
+from pathlib import Path
+from threading import Lock, Timer
+from typing import Optional, Callable
+
+from audio.IAudioBackend import IAudioBackend
+
+
+class PlaybackRecord:
+    """A single call to a NullAudioBackend"""
+    timestamp: float  # time.monotonic of the call
+    action: str  # "play", "stop" or "prepare"
+    file: Optional[Path]
+    preamp: Optional[float]
+
+    def __init__(self, timestamp: float, action: str, file: Optional[Path] = None, preamp: Optional[float] = None):
+        self.timestamp = timestamp
+        self.action = action
+        self.file = file
+        self.preamp = preamp
+
+    def format(self) -> str:
+        line = format(self.timestamp, '.6f') + " " + self.action
+        if self.file is not None:
+            line += " " + self.file.__str__()
+        if self.preamp is not None:
+            line += " preamp=" + format(self.preamp, '.2f')
+        return line
+
+
+class NullAudioBackend(IAudioBackend):
+    """
+    Backend that doesn't output any audio, but records what it was asked to do.
+    This allows running and measuring the whole pipeline from sensor to playback on machines without audio.
+
+    Attributes:
+        start_latency   Seconds after which playing is reported to have started, to simulate a real backend
+        log_path        If given, every call is also appended to this file as a line of text
+    """
+    start_latency: float = 0.0
+    log_path: Optional[Path] = None
+
+    __records: [PlaybackRecord]
+    __lock: Lock
+    __pending_start: Optional[Timer] = None
+
+    def __init__(self, start_latency: float = 0.0, log_path: Optional[Path] = None):
+        self.start_latency = start_latency
+        self.log_path = log_path
+        self.__records = []
+        self.__lock = Lock()
+
+    def __record(self, record: PlaybackRecord):
+        with self.__lock:
+            self.__records.append(record)
+            if self.log_path is not None:
+                with open(self.log_path, 'a') as file_handle:
+                    file_handle.write(record.format() + "\n")
+
+    def get_records(self) -> [PlaybackRecord]:
+        with self.__lock:
+            return list(self.__records)
+
+    def prepare(self, file: Path):
+        self.__record(PlaybackRecord(time.monotonic(), "prepare", file))
+
+    def play(self, file: Path, preamp: float, on_playing: Optional[Callable[[], None]] = None):
+        self.__record(PlaybackRecord(time.monotonic(), "play", file, preamp))
+        if self.__pending_start is not None:
+            self.__pending_start.cancel()
+            self.__pending_start = None
+        if on_playing is None:
+            return
+        if self.start_latency <= 0:
+            on_playing()
+        else:
+            # Reported from another thread, like a real backend would
+            self.__pending_start = Timer(self.start_latency, on_playing)
+            self.__pending_start.daemon = True
+            self.__pending_start.start()
+
+    def stop(self):
+        if self.__pending_start is not None:
+            self.__pending_start.cancel()
+            self.__pending_start = None
+        self.__record(PlaybackRecord(time.monotonic(), "stop"))
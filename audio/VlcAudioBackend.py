@@ -0,0 +1,63 @@
+from pathlib import Path
+from typing import Optional, Callable
+
+import vlc
+
+from audio.IAudioBackend import IAudioBackend
+
+
+class VlcAudioBackend(IAudioBackend):
+    """
+    Plays audio with VLC, which has to be installed on the system for this to work.
+    The VLC instance is created with the first backend rather than on import.
+    """
+    vlcInstance: Optional[vlc.Instance] = None
+    player: vlc.MediaPlayer
+    eq: vlc.AudioEqualizer
+
+    __on_playing: Optional[Callable[[], None]] = None
+    __prepared_file: Optional[Path] = None
+    __prepared_media: Optional[vlc.Media] = None
+
+    def __init__(self):
+        if VlcAudioBackend.vlcInstance is None:
+            VlcAudioBackend.vlcInstance = vlc.Instance()
+        self.player = self.vlcInstance.media_player_new()
+        self.eq = vlc.AudioEqualizer()
+        self.player.set_equalizer(self.eq)
+        self.player.event_manager().event_attach(vlc.EventType.MediaPlayerPlaying, self.__handle_playing)
+
+    def __handle_playing(self, event):
+        # Called from one of VLC's threads
+        callback = self.__on_playing
+        self.__on_playing = None
+        if callback is not None:
+            callback()
+
+    def prepare(self, file: Path):
+        # Parsing runs in VLC's own threads
+        media = vlc.Media(file.__str__())
+        media.parse_with_options(vlc.MediaParseFlag.local, 0)
+        self.__prepared_file = file
+        self.__prepared_media = media
+
+    def drop_prepared(self):
+        self.__prepared_file = None
+        self.__prepared_media = None
+
+    def play(self, file: Path, preamp: float, on_playing: Optional[Callable[[], None]] = None):
+        if file == self.__prepared_file:
+            media = self.__prepared_media
+            self.drop_prepared()
+        else:
+            media = vlc.Media(file.__str__())
+
+        self.__on_playing = on_playing
+        self.eq.set_preamp(preamp)
+        self.player.set_equalizer(self.eq)
+        self.player.audio_set_volume(100)
+        self.player.set_media(media)
+        self.player.play()
+
+    def stop(self):
+        self.player.stop()
@@ -0,0 +1,518 @@
+import json
+import math
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from AudioPlayer import AudioPlayer
+from audio.NullAudioBackend import NullAudioBackend
+from bmp280.BMP280Base import BMP280Base, CompensationMode
+from input.IPressureSensor import IPressureSensor
+from input.PressureInput import PressureInput
+from input.PressureRecording import RecordingPressureSensor, ReplayPressureSensor
+from input.SipPuffEvent import SipPuffListener, SipPuffEvent, SipPuffMessage
+from helpers.EventRuntime import EventRuntime
+from helpers.LatencyTracer import LatencyTracer
+from MusicDB import MusicDB
+from scanner.GainIndex import GainIndex
+from scanner.ScannerEventBatcher import ScannerEventBatcher
+from scanner.ScannerEvents import ScannerEventHandler, ScannerEvent, AudioFileFound, AudioFilesFound
+
+# Calibration values of the example calculation in the BMP280 datasheet
+EXAMPLE_TEMP_CALIB = [27504, 26435, -1000]
+EXAMPLE_PRES_CALIB = [36477, -10685, 3024, 2855, 140, -7, 15500, -14600, 6000]
+EXAMPLE_RAW_TEMP = 519888
+EXAMPLE_RAW_PRES = 415148
+
+
+class OfflineBMP280(BMP280Base):
+    """BMP280 without a bus. It can only compensate raw values with calibration data loaded by hand."""
+
+    def __init__(self):
+        self.load_calibration_data(EXAMPLE_TEMP_CALIB, EXAMPLE_PRES_CALIB)
+
+    def read_single_byte(self, addr: int) -> int:
+        raise Exception("Offline BMP280 can't be read")
+
+    def read_multiple_bytes(self, addr: int, length: int) -> [int]:
+        raise Exception("Offline BMP280 can't be read")
+
+    def write_single_byte(self, addr: int, value: int):
+        raise Exception("Offline BMP280 can't be written")
+
+
+def benchmark_compensation(samples: int = 200_000, grid_size: int = 1024, tolerance: float = 1.0):
+    """
+    Compares the run time of the float and the fixed point compensation and checks that both agree within the
+    tolerance in Pascal on a grid of grid_size by grid_size values across the full 20 bit raw temperature and
+    pressure range.
+    """
+    bmp = OfflineBMP280()
+    raw_pressures = [EXAMPLE_RAW_PRES + (i % 4096) - 2048 for i in range(samples)]
+
+    for mode in CompensationMode:
+        bmp.compensation_mode = mode
+        start = time.perf_counter()
+        for raw_pressure in raw_pressures:
+            bmp.compensate(EXAMPLE_RAW_TEMP, raw_pressure)
+        duration = time.perf_counter() - start
+        print(mode.name + ": " + format(duration / samples * 1e6, '.3f') + " us per sample")
+
+    # Sweep a grid over the whole raw temperature and raw pressure range. Only results within the sensor's
+    # operating range of 300 to 1100 hPa are compared, outside of that the formulas aren't meaningful anyway.
+    max_diff = 0.0
+    compared = 0
+    for raw_temp in range(0, 2 ** 20, 2 ** 20 // grid_size):
+        for raw_pres in range(0, 2 ** 20, 2 ** 20 // grid_size):
+            bmp.compensation_mode = CompensationMode.FLOAT
+            float_value = bmp.compensate(raw_temp, raw_pres)
+            if not 30_000 <= float_value <= 110_000:
+                continue
+            bmp.compensation_mode = CompensationMode.INTEGER
+            int_value = bmp.compensate(raw_temp, raw_pres)
+            diff = abs(float_value - int_value)
+            if diff >= tolerance:
+                raise Exception("Float and integer compensation differ by " + format(diff, '.4f') + " Pa for raw " +
+                                "temperature " + raw_temp.__str__() + " and raw pressure " + raw_pres.__str__())
+            max_diff = max(max_diff, diff)
+            compared += 1
+    if not compared:
+        raise Exception("No raw values within the operating range")
+    print("Compared " + compared.__str__() + " raw values, maximum difference float vs. integer: " +
+          format(max_diff, '.4f') + " Pa")
+
+
+def benchmark_batch_compensation(samples: int = 2 ** 20):
+    """Times the vectorized compensation and checks it against the per sample path"""
+    import numpy as np
+
+    bmp = OfflineBMP280()
+    raw_temps = np.full(samples, EXAMPLE_RAW_TEMP)
+    raw_pressures = np.arange(samples) % (2 ** 20)
+
+    for mode in CompensationMode:
+        bmp.compensation_mode = mode
+        start = time.perf_counter()
+        batch = bmp.compensate_batch(raw_temps, raw_pressures)
+        duration = time.perf_counter() - start
+
+        max_diff = max(abs(batch[i] - bmp.compensate(EXAMPLE_RAW_TEMP, int(raw_pressures[i])))
+                       for i in range(0, samples, 97))
+        if max_diff != 0:
+            raise Exception(mode.name + " batch compensation differs from the per sample path by " +
+                            max_diff.__str__() + " Pa")
+        print(mode.name + " batch: " + format(samples / duration / 1e6, '.1f') + " M samples/s, " +
+              "maximum difference to per sample path: " + max_diff.__str__() + " Pa")
+
+
+class SyntheticSession(IPressureSensor):
+    """
+    Generates a pressure trace resembling a session: drifting ambient pressure, sensor noise and
+    sips and puffs of random length and strength every few seconds.
+    """
+    sample_period: float = 0.01
+    __time: float = 0.0
+    __action_end: float = 0.0
+    __next_action: float = 5.0
+    __action_pressure: float = 0.0
+
+    def __init__(self, seed: int = 0):
+        self.__random = random.Random(seed)
+
+    def get_time(self) -> float:
+        return self.__time
+
+    def get_pressure_in_Pascal(self) -> float:
+        self.__time += self.sample_period
+        if self.__time >= self.__next_action:
+            self.__action_end = self.__time + self.__random.uniform(0.05, 2.5)
+            self.__action_pressure = self.__random.choice([-1, 1]) * self.__random.uniform(300, 1200)
+            self.__next_action = self.__action_end + self.__random.uniform(1.0, 6.0)
+        ambient = 97_500.0 + 50.0 * math.sin(self.__time / 600.0)
+        action = self.__action_pressure if self.__time < self.__action_end else 0.0
+        return ambient + action + self.__random.gauss(0, 5.0)
+
+
+class EventCounter(SipPuffListener):
+    """Collects the events of a PressureInput together with the time of the reading that triggered them"""
+
+    def __init__(self, clock: Callable[[], float]):
+        self.clock = clock
+        self.events = []
+
+    def handle_sip_puff_event(self, event: SipPuffEvent) -> None:
+        self.events.append((self.clock(), event))
+
+
+def write_synthetic_log(log_path: Path, seconds: float = 3600.0):
+    """Records a synthetic session into a pressure log"""
+    session = SyntheticSession()
+    recorder = RecordingPressureSensor(session, log_path, clock=session.get_time)
+    recorder.flush_interval = 10_000
+    for _ in range(round(seconds / session.sample_period)):
+        recorder.get_pressure_in_Pascal()
+    recorder.close()
+
+
+def benchmark_replay(log_path: Path):
+    """Feeds a pressure log through PressureInput as fast as possible"""
+    replay = ReplayPressureSensor(log_path)
+    pressure_input = PressureInput(replay, clock=replay.get_time)
+    counter = EventCounter(replay.get_time)
+    pressure_input.register_listener(counter)
+
+    start = time.perf_counter()
+    while replay.has_more():
+        pressure_input.update()
+    duration = time.perf_counter() - start
+
+    samples = replay.get_record_count()
+    recorded_seconds = replay.get_record(samples - 1)[0] - replay.get_record(0)[0] if samples else 0.0
+    print("Replayed " + samples.__str__() + " samples (" + format(recorded_seconds, '.0f') + " s) in " +
+          format(duration, '.2f') + " s, " + format(samples / duration, '.0f') + " samples/s, " +
+          len(counter.events).__str__() + " events")
+
+    benchmark_batch_detection(replay, pressure_input, counter.events)
+    benchmark_estimators(replay)
+    replay.close()
+
+
+def benchmark_batch_detection(replay: ReplayPressureSensor, template: PressureInput,
+                              expected: [(float, SipPuffEvent)]):
+    """
+    Runs the batch detection over a replayed log and checks that it emits exactly the events of the streaming
+    detection at the same readings
+    """
+    from input.BatchPressureInput import BatchPressureInput
+
+    records = replay.get_record_array()
+    batch_input = BatchPressureInput(template)
+
+    start = time.perf_counter()
+    reference = batch_input.compute_reference(records["pressure"])
+    reference_duration = time.perf_counter() - start
+
+    start = time.perf_counter()
+    events = batch_input.detect(records["time"], records["pressure"], reference)
+    detect_duration = time.perf_counter() - start
+
+    del records
+    for i, ((time_batch, event_batch), (time_streaming, event_streaming)) in enumerate(zip(events, expected)):
+        if event_batch != event_streaming or time_batch != time_streaming:
+            raise Exception("Batch event " + i.__str__() + " is " + event_batch.name + " at " +
+                            time_batch.__str__() + " s, streaming " + event_streaming.name + " at " +
+                            time_streaming.__str__() + " s")
+    if len(events) != len(expected):
+        raise Exception("Batch detection emitted " + len(events).__str__() + " events, streaming " +
+                        len(expected).__str__())
+    samples = replay.get_record_count()
+    print("Batch detection: reference filter " + format(samples / reference_duration, '.0f') +
+          " samples/s, state machine " + format(samples / detect_duration, '.0f') + " samples/s, " +
+          len(events).__str__() + " events identical to streaming")
+
+
+def check_estimator_batch(estimator_class: type, pressures, batch_estimations):
+    """
+    Checks that update_batch gives exactly the estimations of per reading updates, also when both are mixed and
+    the batches have all kinds of sizes
+    """
+    import numpy as np
+
+    estimator = estimator_class()
+    expected = []
+    for reading in pressures.tolist():
+        estimator.update(reading)
+        expected.append(estimator.get_ambient_pressure_estimation())
+    expected = np.array(expected, dtype=np.float64)
+    if not np.array_equal(batch_estimations, expected):
+        first = int(np.flatnonzero(batch_estimations != expected)[0])
+        raise Exception(estimator_class.__name__ + ".update_batch differs from update at reading " +
+                        first.__str__() + ": " + batch_estimations[first].__str__() + " instead of " +
+                        expected[first].__str__())
+
+    chunk_random = random.Random(0)
+    estimator = estimator_class()
+    position = 0
+    while position < len(pressures):
+        size = chunk_random.choice([1, 2, 7, 99, 100, 101, 1000, 3333])
+        chunk = pressures[position:position + size]
+        if chunk_random.random() < 0.3:
+            mixed = []
+            for reading in chunk.tolist():
+                estimator.update(reading)
+                mixed.append(estimator.get_ambient_pressure_estimation())
+            mixed = np.array(mixed, dtype=np.float64)
+        else:
+            mixed = estimator.update_batch(chunk)
+        if not np.array_equal(mixed, expected[position:position + len(chunk)]):
+            raise Exception(estimator_class.__name__ + " gives different estimations when mixing update and " +
+                            "update_batch, in the chunk starting at reading " + position.__str__())
+        position += len(chunk)
+
+
+def benchmark_estimators(replay: ReplayPressureSensor, tolerance: float = 20.0):
+    """
+    Compares the ambient pressure estimators on a replayed log: CPU time per reading for per reading and batch
+    updates and the time until the estimation is within the tolerance after boot. The boot is simulated twice,
+    once at the start of the log and once with the first second of it being a puff of 800 Pa.
+    The ground truth is a centered median over one minute of the whole log, which no causal estimator can know.
+    """
+    import numpy as np
+    from input.AlphaBetaReferenceFilter import AlphaBetaReferenceFilter
+    from input.RollingMedianReferenceFilter import RollingMedianReferenceFilter
+    from input.SingleSensorReferenceFilter import SingleSensorReferenceFilter
+
+    records = replay.get_record_array()
+    times = np.array(records["time"])
+    pressures = np.array(records["pressure"])
+    del records
+
+    # Centered median of the per second medians as ground truth
+    block = 100
+    block_medians = np.median(pressures[:len(pressures) // block * block].reshape(-1, block), axis=1)
+    padded = np.pad(block_medians, 30, mode='edge')
+    windows = np.lib.stride_tricks.as_strided(padded, (len(padded) - 60, 61), padded.strides * 2, writeable=False)
+    truth = np.median(windows, axis=1)
+    truth = truth[np.minimum(np.arange(len(pressures)) // block, len(truth) - 1)]
+
+    def convergence_time(readings) -> str:
+        settled = np.flatnonzero(np.abs(readings - truth) < tolerance)
+        return "never" if len(settled) == 0 else format(times[settled[0]] - times[0], '.1f') + " s"
+
+    puffed = pressures.copy()
+    puffed[:block] += 800.0
+
+    for estimator_class in [SingleSensorReferenceFilter, RollingMedianReferenceFilter, AlphaBetaReferenceFilter]:
+        estimator = estimator_class()
+        start = time.perf_counter()
+        for reading in pressures.tolist():
+            estimator.update(reading)
+        update_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        estimations = estimator_class().update_batch(pressures)
+        batch_duration = time.perf_counter() - start
+
+        check_estimator_batch(estimator_class, pressures, estimations)
+
+        print(estimator_class.__name__ + ": update " + format(update_duration / len(pressures) * 1e6, '.2f') +
+              " us, update_batch " + format(batch_duration / len(pressures) * 1e6, '.3f') +
+              " us per reading, converged after " + convergence_time(estimations) +
+              ", booted during puff: " + convergence_time(estimator_class().update_batch(puffed)))
+
+
+class PipeEventSender(ScannerEventHandler):
+    """Sends scanner events through a pipe like ScannerWorker does"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def handle_scanner_event(self, event: ScannerEvent):
+        self.connection.send(event)
+
+
+def send_scanner_events(connection, files: int, batched: bool):
+    handler = PipeEventSender(connection)
+    if batched:
+        handler = ScannerEventBatcher(handler)
+    for i in range(files):
+        handler.handle_scanner_event(AudioFileFound(Path("/media/usb0/artist " + (i // 100).__str__() +
+                                                         "/track " + i.__str__() + ".mp3"), -7.5))
+    if batched:
+        handler.flush()
+
+
+def benchmark_scanner_ipc(files: int = 100_000):
+    """Measures how many found files per second get from a scanner process to the main process"""
+    for batched in [False, True]:
+        receiver, sender = mp.Pipe(duplex=False)
+        process = mp.Process(target=send_scanner_events, args=(sender, files, batched), daemon=True)
+        start = time.perf_counter()
+        process.start()
+        received = 0
+        while received < files:
+            event = receiver.recv()
+            if isinstance(event, AudioFilesFound):
+                for _ in event:
+                    received += 1
+            else:
+                received += 1
+        duration = time.perf_counter() - start
+        process.join()
+        print(("Batched" if batched else "Single") + " scanner events: " + format(files / duration, '.0f') +
+              " files/s")
+
+
+def benchmark_gain_index(entries: int = 200_000, lookups: int = 100_000):
+    """Compares loading and searching a gain database as JSON and as binary index"""
+    data = {}
+    for i in range(entries):
+        digest = random.getrandbits(160).to_bytes(20, 'big').hex()
+        data[digest] = random.uniform(-30.0, -5.0)
+    keys = random.sample(list(data.keys()), lookups)
+    # Imported once per process by the index, which shouldn't count as the load time of a single index
+    import numpy
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = Path(directory) / "gain_database.json"
+        index_path = Path(directory) / GainIndex.file_name
+        with open(json_path, 'w') as file_handle:
+            file_handle.write(json.dumps(data))
+        GainIndex.write(data, index_path)
+
+        for name, load in [("JSON", lambda: json.load(open(json_path, 'r'))),
+                           ("Index mapped", lambda: GainIndex.open(index_path)),
+                           ("Index read", lambda: GainIndex.open(index_path, memory_map=False))]:
+            start = time.perf_counter()
+            gain_db = load()
+            load_duration = time.perf_counter() - start
+            start = time.perf_counter()
+            for key in keys:
+                gain = gain_db.get(key)
+                if gain is None or abs(gain - data[key]) > 1e-5:
+                    raise Exception(name + " returned a wrong gain level")
+            if gain_db.get("0" * 40) is not None:
+                raise Exception(name + " found a key that isn't there")
+            lookup_duration = time.perf_counter() - start
+            print(name + ": loaded " + entries.__str__() + " entries in " + format(load_duration * 1000, '.1f') +
+                  " ms, " + format(lookup_duration / lookups * 1e6, '.1f') + " us per lookup")
+            if isinstance(gain_db, GainIndex):
+                start = time.perf_counter()
+                gains = gain_db.get_many(keys)
+                batch_duration = time.perf_counter() - start
+                if any(gain is None or abs(gain - data[key]) > 1e-5 for key, gain in zip(keys, gains)):
+                    raise Exception(name + " returned a wrong gain level in a batch")
+                print(name + ": " + format(batch_duration / lookups * 1e6, '.1f') + " us per batched lookup")
+                gain_db.close()
+        print("File size: JSON " + format(os.path.getsize(json_path) / 1e6, '.1f') + " MB, index " +
+              format(os.path.getsize(index_path) / 1e6, '.1f') + " MB")
+
+
+def benchmark_music_db(entries: int = 500_000, drives: int = 8):
+    """
+    Measures adding, picking and updating entries of a MusicDB with lots of tracks on several drives, once sorted
+    into albums and once with all tracks of a drive in a single folder
+    """
+    def album_path(i: int) -> Path:
+        return Path("/media/usb" + (i % drives).__str__() + "/Artist " + (i // 800).__str__() + "/Album " +
+                    (i // 16).__str__() + "/" + (i % 16).__str__() + " - Track.mp3")
+
+    def flat_path(i: int) -> Path:
+        return Path("/media/usb" + (i % drives).__str__() + "/Track " + i.__str__() + ".mp3")
+
+    for layout, track_path in [("albums", album_path), ("flat", flat_path)]:
+        mdb = MusicDB()
+        for drive in range(drives):
+            mdb.add_root_path(Path("/media/usb" + drive.__str__()))
+        start = time.perf_counter()
+        for i in range(entries):
+            mdb.add_entry(track_path(i), -10.0)
+        add_duration = time.perf_counter() - start
+
+        picks = 100_000
+        start = time.perf_counter()
+        for _ in range(picks):
+            mdb.get_random_entry()
+        pick_duration = time.perf_counter() - start
+
+        updates = 10_000
+        start = time.perf_counter()
+        for i in range(updates):
+            mdb.update_gain_level(track_path(i), -12.0)
+        update_duration = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for i in range(updates):
+            if mdb.get_gain_level(track_path(i)) != -12.0:
+                raise Exception("MusicDB returned a wrong gain level")
+        lookup_duration = time.perf_counter() - start
+
+        print("MusicDB with " + mdb.get_entry_count().__str__() + " entries in " + layout + " folders: add " +
+              format(add_duration / entries * 1e6, '.1f') + " us, random entry " +
+              format(pick_duration / picks * 1e6, '.1f') + " us, gain update " +
+              format(update_duration / updates * 1e6, '.1f') + " us, gain lookup " +
+              format(lookup_duration / updates * 1e6, '.1f') + " us")
+
+
+def send_sip_puff_messages(connection, messages: int, interval: float):
+    # Alternates puffs and sips like a user skipping through tracks
+    for i in range(messages):
+        time.sleep(interval)
+        event = SipPuffEvent.SHORT_WEAK_PUFF if i % 2 == 0 else SipPuffEvent.SHORT_WEAK_SIP
+        message = SipPuffMessage(event, "benchmark")
+        message.stamp("sent")
+        connection.send(message)
+
+
+def benchmark_playback_pipeline(messages: int = 2000, interval: float = 0.002, start_latency: float = 0.0):
+    """
+    Measures the way of sip-puff events from a worker process to the audio backend, like main does it, but with a
+    backend that doesn't output audio, so it runs on machines without a sound card.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        track = Path(directory) / "track.mp3"
+        with open(track, 'wb') as file_handle:
+            file_handle.write(os.urandom(2 ** 16))
+
+        backend = NullAudioBackend(start_latency=start_latency)
+        player = AudioPlayer(backend)
+        tracer = LatencyTracer()
+        received = 0
+
+        def record_playing(message: SipPuffMessage):
+            message.stamp("playing")
+            tracer.record(message)
+
+        async def handle_sip_puff_message(message: SipPuffMessage):
+            nonlocal received
+            message.stamp("dispatched")
+            if message.event in SipPuffEvent.get_all_puff_events():
+                message.stamp("play_called")
+                player.play(track, -10.0, on_playing=lambda: record_playing(message))
+                player.prepare(track)
+            else:
+                player.stop()
+                message.stamp("stopped")
+                tracer.record(message)
+            received += 1
+            if received == messages:
+                runtime.stop()
+
+        receiver, sender = mp.Pipe(duplex=False)
+        process = mp.Process(target=send_sip_puff_messages, args=(sender, messages, interval), daemon=True)
+        runtime = EventRuntime()
+        runtime.add_connection(receiver)
+        runtime.add_handler(SipPuffMessage, handle_sip_puff_message)
+        process.start()
+        runtime.run()
+        process.join()
+        player.drop_prepared()
+
+    plays = [record for record in backend.get_records() if record.action == "play"]
+    if len(plays) != (messages + 1) // 2 or any(record.preamp != -5.0 for record in plays):
+        raise Exception("Null backend recorded wrong play calls")
+    print("Playback pipeline with null backend:")
+    tracer.dump()
+
+
+if __name__ == '__main__':
+    benchmark_compensation()
+    benchmark_batch_compensation()
+    benchmark_scanner_ipc()
+    benchmark_gain_index()
+    benchmark_music_db()
+    benchmark_playback_pipeline()
+    # Replays the pressure logs given on the command line or an hour of a synthetic session
+    if len(sys.argv) > 1:
+        for arg in sys.argv[1:]:
+            benchmark_replay(Path(arg))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            synthetic_log = Path(directory) / "synthetic_session.log"
+            write_synthetic_log(synthetic_log)
+            benchmark_replay(synthetic_log)
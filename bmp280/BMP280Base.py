@@ -1,6 +1,8 @@
 from abc import abstractmethod
-from enum import IntFlag
+from enum import IntFlag, Enum, auto
 import struct
+import time
+from typing import Optional
 
 from input.IPressureSensor import IPressureSensor
 
@@ -55,6 +57,12 @@ class SamplingMode(IntFlag):
     X_16 = 0b101
 
 
+class CompensationMode(Enum):
+    """Selects which of the datasheet's compensation formulas is used for converting raw readings"""
+    FLOAT = auto()  # Double precision floating point formulas
+    INTEGER = auto()  # 32 bit temperature and 64 bit pressure fixed point formulas, bit exact with the datasheet
+
+
 class PowerMode(IntFlag):
     SLEEP = 0b0
     FORCED = 0b01
@@ -62,11 +70,12 @@ class PowerMode(IntFlag):
 
 
 class FilterCoefficient(IntFlag):
-    OFF = 0b0
-    VAL_2 = 2
-    VAL_4 = 4
-    VAL_8 = 8
-    VAL_16 = 16
+    """Coefficient of the chip's IIR filter. The values are the register codes, not the coefficients themselves."""
+    OFF = 0b000
+    VAL_2 = 0b001
+    VAL_4 = 0b010
+    VAL_8 = 0b011
+    VAL_16 = 0b100
 
 
 class StandbyTime(IntFlag):
@@ -81,6 +90,162 @@ class StandbyTime(IntFlag):
     MS_4000 = 0b111
 
 
+class SensorConfiguration:
+    """
+    The measurement options of the BMP280 together with a model of the resulting timing from the datasheet.
+
+    Attributes:
+        temperature_mode    Oversampling of the temperature measurement
+        pressure_mode       Oversampling of the pressure measurement
+        power_mode          Normal mode measures continuously, forced mode measures once per sample read
+        standby_time        Wait time between two measurements in normal mode
+        filter_coeff        Coefficient of the IIR filter applied by the chip
+    """
+    temperature_mode: SamplingMode
+    pressure_mode: SamplingMode
+    power_mode: PowerMode
+    standby_time: StandbyTime
+    filter_coeff: FilterCoefficient
+
+    # Number of samples per oversampling setting
+    __oversampling_counts: {SamplingMode: int} = {
+        SamplingMode.NO_SAMPLING: 0,
+        SamplingMode.X_1: 1,
+        SamplingMode.X_2: 2,
+        SamplingMode.X_4: 4,
+        SamplingMode.X_8: 8,
+        SamplingMode.X_16: 16,
+    }
+
+    __standby_times_ms: {StandbyTime: float} = {
+        StandbyTime.MINIMUM: 0.5,
+        StandbyTime.MS_62: 62.5,
+        StandbyTime.MS_125: 125.0,
+        StandbyTime.MS_250: 250.0,
+        StandbyTime.MS_500: 500.0,
+        StandbyTime.MS_1000: 1000.0,
+        StandbyTime.MS_2000: 2000.0,
+        StandbyTime.MS_4000: 4000.0,
+    }
+
+    # Number of samples the IIR filter needs to reach 75% of a step change
+    __filter_step_response_samples: {FilterCoefficient: int} = {
+        FilterCoefficient.OFF: 1,
+        FilterCoefficient.VAL_2: 2,
+        FilterCoefficient.VAL_4: 5,
+        FilterCoefficient.VAL_8: 11,
+        FilterCoefficient.VAL_16: 22,
+    }
+
+    def __init__(self,
+                 temperature_mode: SamplingMode = SamplingMode.X_2,
+                 pressure_mode: SamplingMode = SamplingMode.X_2,
+                 power_mode: PowerMode = PowerMode.NORMAL,
+                 standby_time: StandbyTime = StandbyTime.MINIMUM,
+                 filter_coeff: FilterCoefficient = FilterCoefficient.VAL_2):
+        self.temperature_mode = temperature_mode
+        self.pressure_mode = pressure_mode
+        self.power_mode = power_mode
+        self.standby_time = standby_time
+        self.filter_coeff = filter_coeff
+
+    def get_config_register(self) -> int:
+        """
+        :return: The value for the config register, t_sb in bits 7-5, filter in bits 4-2
+        """
+        return (self.standby_time << 5) + (self.filter_coeff << 2)
+
+    def get_control_register(self, power_mode: Optional[PowerMode] = None) -> int:
+        """
+        :param power_mode: Power mode to write instead of the configured one, e.g. for starting in sleep mode
+        :return: The value for the control register, osrs_t in bits 7-5, osrs_p in bits 4-2, mode in bits 1-0
+        """
+        if power_mode is None:
+            power_mode = self.power_mode
+        return (self.temperature_mode << 5) + (self.pressure_mode << 2) + power_mode
+
+    def get_measurement_time(self, maximum: bool = True) -> float:
+        """
+        Time the chip needs for a single measurement with the configured oversampling.
+        :param maximum: Whether to return the datasheet's maximum instead of the typical measurement time
+        :return: The measurement time in seconds
+        """
+        temp_count = self.__oversampling_counts[self.temperature_mode]
+        pres_count = self.__oversampling_counts[self.pressure_mode]
+        if maximum:
+            time_ms = 1.25 + 2.3 * temp_count + (2.3 * pres_count + 0.575 if pres_count else 0)
+        else:
+            time_ms = 1.0 + 2.0 * temp_count + (2.0 * pres_count + 0.5 if pres_count else 0)
+        return time_ms / 1000.0
+
+    def get_output_data_rate(self) -> float:
+        """
+        Rate at which the chip produces new measurements.
+        In normal mode this is determined by measurement and standby time. In forced mode every read triggers a
+        measurement, so the rate is limited by the maximum measurement time only.
+        :return: The output data rate in Hz
+        """
+        if self.power_mode == PowerMode.NORMAL:
+            cycle_ms = self.get_measurement_time(maximum=False) * 1000.0 + self.__standby_times_ms[self.standby_time]
+            return 1000.0 / cycle_ms
+        elif self.power_mode == PowerMode.FORCED:
+            return 1.0 / self.get_measurement_time(maximum=True)
+        return 0.0
+
+    def get_sample_period(self) -> Optional[float]:
+        """
+        :return: The time between two new measurements in seconds, None in sleep mode
+        """
+        rate = self.get_output_data_rate()
+        if rate == 0:
+            return None
+        return 1.0 / rate
+
+    def get_filter_response_time(self) -> Optional[float]:
+        """
+        :return: The time in seconds the IIR filter needs to follow 75% of a step change, None in sleep mode
+        """
+        period = self.get_sample_period()
+        if period is None:
+            return None
+        return period * self.__filter_step_response_samples[self.filter_coeff]
+
+    @staticmethod
+    def create_sip_puff():
+        """Default for the jukebox: roughly 100 Hz with light filtering, fast enough to time short actions"""
+        return SensorConfiguration()
+
+    @staticmethod
+    def create_handheld_low_power():
+        """Datasheet preset "handheld device low-power", 10 Hz"""
+        return SensorConfiguration(SamplingMode.X_2, SamplingMode.X_16, PowerMode.NORMAL,
+                                   StandbyTime.MS_62, FilterCoefficient.VAL_4)
+
+    @staticmethod
+    def create_handheld_dynamic():
+        """Datasheet preset "handheld device dynamic", 83 Hz"""
+        return SensorConfiguration(SamplingMode.X_1, SamplingMode.X_4, PowerMode.NORMAL,
+                                   StandbyTime.MINIMUM, FilterCoefficient.VAL_16)
+
+    @staticmethod
+    def create_weather_monitoring():
+        """Datasheet preset "weather monitoring", single measurements in forced mode"""
+        return SensorConfiguration(SamplingMode.X_1, SamplingMode.X_1, PowerMode.FORCED,
+                                   StandbyTime.MINIMUM, FilterCoefficient.OFF)
+
+    @staticmethod
+    def create_drop_detection():
+        """Datasheet preset "drop detection", 125 Hz without filtering"""
+        return SensorConfiguration(SamplingMode.X_1, SamplingMode.X_2, PowerMode.NORMAL,
+                                   StandbyTime.MINIMUM, FilterCoefficient.OFF)
+
+    @staticmethod
+    def create_indoor_navigation():
+        """Datasheet preset "indoor navigation", 26 Hz with strong filtering"""
+        return SensorConfiguration(SamplingMode.X_2, SamplingMode.X_16, PowerMode.NORMAL,
+                                   StandbyTime.MINIMUM, FilterCoefficient.VAL_16)
+
+
 class BMP280Base(IPressureSensor):
     """
     Base class for the different bus variants of the BMP280.
@@ -121,16 +286,42 @@ class BMP280Base(IPressureSensor):
         """
         pass
 
-    __temperatureMode: SamplingMode = SamplingMode.X_1
-    __pressureMode: SamplingMode = SamplingMode.X_1
-    __powerMode: PowerMode = PowerMode.NORMAL
-
-    __standbyTime: StandbyTime = StandbyTime.MINIMUM
-    __filterCoeff: FilterCoefficient = FilterCoefficient.VAL_2
+    # Created per sensor on first use, a default shared through the class would change for all sensors at once
+    __configuration: Optional[SensorConfiguration] = None
 
     __tempCalibData: [int]
     __presCalibData: [int]
 
+    # Calibration constants pre-scaled once in configure_sensor, so the compensation formulas
+    # don't have to redo the divisions from the datasheet on every sample
+    __tempScaled: (float, float, float, float)
+    __presScaled: (float, float, float, float, float, float, float, float, float)
+
+    # Number of samples after which the temperature is read again. The temperature changes slowly
+    # compared to the pressure, so refreshing it less often saves bus transfers and arithmetic.
+    temperature_refresh_interval: int = 1
+    __samples_since_temp_refresh: int = 0
+    __last_temp_compensated: Optional[float] = None
+
+    # The fixed point formulas avoid floats entirely and give reproducible values when replaying raw data
+    compensation_mode: CompensationMode = CompensationMode.FLOAT
+    __last_temp_mode: Optional[CompensationMode] = None
+
+    # Raw values of the last pressure reading
+    __last_raw_temp: Optional[int] = None
+    __last_raw_pres: Optional[int] = None
+
+    def get_configuration(self) -> SensorConfiguration:
+        """
+        :return: The configuration last written to the chip
+        """
+        if self.__configuration is None:
+            self.__configuration = SensorConfiguration()
+        return self.__configuration
+
+    def get_sample_period(self) -> Optional[float]:
+        return self.get_configuration().get_sample_period()
+
     def check_chip_id(self) -> bool:
         """
         Tries to read the chip ID value from the chip and compares it to the
@@ -139,20 +330,24 @@ class BMP280Base(IPressureSensor):
         """
         return self.read_single_byte(0xD0) == 0x58
 
-    def configure_sensor(self):
+    def configure_sensor(self, configuration: Optional[SensorConfiguration] = None):
         """
         Configures the sensor by writing the options such as power mode to the chip.
         This also reads the factory calibration data off the chip.
+        :param configuration: The options to write, if None the current ones are written again
         :return: None
         """
+        if configuration is not None:
+            self.__configuration = configuration
+        configuration = self.get_configuration()
 
-        # Create config register data
-        config_data: int = (self.__filterCoeff << 1) + (self.__standbyTime << (1 + 3))
-        self.write_single_byte(Registers.CONFIG, config_data)
+        # The config register is only guaranteed to be written in sleep mode
+        self.write_single_byte(Registers.CONTROL, configuration.get_control_register(PowerMode.SLEEP))
+        self.write_single_byte(Registers.CONFIG, configuration.get_config_register())
 
-        # Create control register data
-        control_data: int = self.__powerMode + (self.__pressureMode << 2) + (self.__temperatureMode << (2 + 3))
-        self.write_single_byte(Registers.CONTROL, control_data)
+        # Forced mode measurements are triggered per sample, so the chip stays asleep until then
+        if configuration.power_mode == PowerMode.NORMAL:
+            self.write_single_byte(Registers.CONTROL, configuration.get_control_register())
 
         # Read the calibration data raw values
         temp_calib_raw = self.read_multiple_bytes(Registers.CALIB_TEMP_1_LOW, 6)
@@ -160,8 +355,60 @@ class BMP280Base(IPressureSensor):
 
         # Both of these are actually 16 bit numbers in two halves, and in both cases the first 16 bit
         # number is unsigned, while the remaining ones are signed
-        self.__tempCalibData = self.__convert_raw_calib_data(temp_calib_raw)
-        self.__presCalibData = self.__convert_raw_calib_data(pres_calib_raw)
+        self.load_calibration_data(self.__convert_raw_calib_data(temp_calib_raw),
+                                   self.__convert_raw_calib_data(pres_calib_raw))
+
+    def load_calibration_data(self, temp_calib: [int], pres_calib: [int]):
+        """
+        Sets the calibration values used for compensating raw readings.
+        configure_sensor does this with the values read off the chip, but this can also be used to compensate
+        raw readings recorded from a known chip without access to it.
+        :param temp_calib: The three temperature calibration values dig_T1 to dig_T3
+        :param pres_calib: The nine pressure calibration values dig_P1 to dig_P9
+        :return: None
+        """
+        if len(temp_calib) != 3 or len(pres_calib) != 9:
+            raise Exception("Calib data must consist of 3 temperature and 9 pressure values")
+        self.__tempCalibData = list(temp_calib)
+        self.__presCalibData = list(pres_calib)
+        self.__prescale_calib_data()
+
+        # Make sure the next sample reads a fresh temperature with the new calibration
+        self.__last_temp_compensated = None
+
+    def get_calibration_data(self) -> ([int], [int]):
+        """
+        :return: A tuple of the temperature and the pressure calibration values
+        """
+        return list(self.__tempCalibData), list(self.__presCalibData)
+
+    def __prescale_calib_data(self):
+        """
+        Folds the constant divisions of the datasheet's compensation formulas into the calibration values.
+        The formulas are expanded into polynomials of the raw values, so only the coefficients depend on the
+        calibration data.
+        :return: None
+        """
+        t1, t2, t3 = self.__tempCalibData
+        self.__tempScaled = (
+            t2 / 16384.0,
+            t1 / 1024.0 * t2,
+            t1 / 8192.0,
+            float(t3),
+        )
+
+        p1, p2, p3, p4, p5, p6, p7, p8, p9 = self.__presCalibData
+        self.__presScaled = (
+            p6 / 131072.0,  # var1^2 coefficient of var2
+            p5 / 2.0,  # var1 coefficient of var2
+            p4 * 65536.0,  # constant part of var2
+            p3 / 524288.0 / 524288.0 / 32768.0 * p1,  # var1^2 coefficient of the divisor
+            p2 / 524288.0 / 32768.0 * p1,  # var1 coefficient of the divisor
+            float(p1),  # constant part of the divisor
+            p9 / 2147483648.0 / 16.0,  # p^2 coefficient of the correction
+            p8 / 32768.0 / 16.0,  # p coefficient of the correction
+            p7 / 16.0,  # constant part of the correction
+        )
 
     @staticmethod
     def __convert_raw_calib_data(data: [int]) -> [int]:
@@ -196,14 +443,31 @@ class BMP280Base(IPressureSensor):
         :return: The measurement value as an int
         """
         data: [int] = self.read_multiple_bytes(start, 3)
+        return self.__to_20bit_int(data[0], data[1], data[2])
 
-        high: int = data[0]
-        middle: int = data[1]
-        low: int = data[2]
-
+    @staticmethod
+    def __to_20bit_int(high: int, middle: int, low: int) -> int:
+        """
+        Combines the three bytes of a measurement into its 20 bit value
+        :param high: The most significant byte
+        :param middle: The middle byte
+        :param low: The least significant byte, only its upper half carries data
+        :return: The measurement value as an int
+        """
         # 20 Bit value, only upper half of low byte is used
-        val = (low >> 4) + (middle << 4) + (high << (4 + 8))
-        return val
+        return (low >> 4) + (middle << 4) + (high << (4 + 8))
+
+    def read_raw_burst(self) -> (int, int):
+        """
+        Reads the raw temperature and pressure in a single burst read of the data registers 0xF7 to 0xFC.
+        This halves the bus transactions compared to reading both values separately and, since it's one
+        continuous read, the chip guarantees both values belong to the same measurement.
+        :return: A tuple of the raw temperature and the raw pressure value
+        """
+        data: [int] = self.read_multiple_bytes(Registers.PRESSURE_BYTE_HIGH, 6)
+        raw_pressure = self.__to_20bit_int(data[0], data[1], data[2])
+        raw_temperature = self.__to_20bit_int(data[3], data[4], data[5])
+        return raw_temperature, raw_pressure
 
     def __read_temp_raw(self):
         """
@@ -226,10 +490,11 @@ class BMP280Base(IPressureSensor):
         :param raw_temperature: The raw temperature as read from the chip
         :return: The temperature after applying the calibration
         """
-        var1 = (raw_temperature / 16384.0 - self.__tempCalibData[0] / 1024.0) * self.__tempCalibData[1]
-        var2 = raw_temperature / 131072.0 - self.__tempCalibData[0] / 8192.0
-        var2 = var2 * var2 * self.__tempCalibData[2]
-        return (var1 + var2)
+        t_a, t_b, t_c, t_d = self.__tempScaled
+        var1 = raw_temperature * t_a - t_b
+        var2 = raw_temperature / 131072.0 - t_c
+        var2 = var2 * var2 * t_d
+        return var1 + var2
 
     def __compensate_pressure(self, raw_pressure, temp_compensated):
         """
@@ -241,36 +506,185 @@ class BMP280Base(IPressureSensor):
         :return: The pressure after calibration and temperature compensation in Pascal
         """
 
+        v2_a, v2_b, v2_c, v1_a, v1_b, v1_c, p_a, p_b, p_c = self.__presScaled
         var1 = temp_compensated / 2.0 - 64000.0
-        var2 = var1 * var1 * self.__presCalibData[5] / 32768.0
-        var2 = var2 + var1 * self.__presCalibData[4] * 2.0
-        var2 = var2 / 4.0 + self.__presCalibData[3] * 65536.0
-        var1 = (self.__presCalibData[2] * var1 * var1 / 524288.0 + self.__presCalibData[1] * var1) / 524288.0
-        var1 = (1.0 + var1 / 32768.0) * self.__presCalibData[0]
+        var2 = (v2_a * var1 + v2_b) * var1 + v2_c
+        var1 = (v1_a * var1 + v1_b) * var1 + v1_c
         if var1 == 0:
             return 0
         pressure = 1048576.0 - raw_pressure
         pressure = (pressure - var2 / 4096.0) * 6250.0 / var1
-        var1 = self.__presCalibData[8] * pressure * pressure / 2147483648.0
-        var2 = pressure * self.__presCalibData[7] / 32768.0
-        pressure = pressure + (var1 + var2 + self.__presCalibData[6]) / 16.0
+        pressure = pressure + (p_a * pressure + p_b) * pressure + p_c
 
         return pressure
 
+    def __compensate_temperature_int(self, raw_temperature: int) -> int:
+        """
+        Fixed point variant of the temperature compensation from the datasheet.
+        :param raw_temperature: The raw temperature as read from the chip
+        :return: t_fine, the compensated temperature in the fine resolution the pressure compensation needs
+        """
+        t1, t2, t3 = self.__tempCalibData
+        var1 = (((raw_temperature >> 3) - (t1 << 1)) * t2) >> 11
+        var2 = (raw_temperature >> 4) - t1
+        var2 = (((var2 * var2) >> 12) * t3) >> 14
+        return var1 + var2
+
+    def __compensate_pressure_int(self, raw_pressure: int, t_fine: int) -> int:
+        """
+        Fixed point variant of the 64 bit pressure compensation from the datasheet.
+        Python's integers don't overflow, and the shifts behave like the arithmetic shifts the reference
+        implementation relies on. Only the division has to truncate towards zero like C does.
+        :param raw_pressure: Raw pressure value
+        :param t_fine: Compensated temperature from the fixed point temperature compensation
+        :return: The pressure in Pascal as unsigned Q24.8 fixed point number, i.e. in 1/256 Pascal
+        """
+        p1, p2, p3, p4, p5, p6, p7, p8, p9 = self.__presCalibData
+        var1 = t_fine - 128000
+        var2 = var1 * var1 * p6
+        var2 = var2 + ((var1 * p5) << 17)
+        var2 = var2 + (p4 << 35)
+        var1 = ((var1 * var1 * p3) >> 8) + ((var1 * p2) << 12)
+        var1 = (((1 << 47) + var1) * p1) >> 33
+        if var1 == 0:
+            return 0
+        pressure = 1048576 - raw_pressure
+        numerator = ((pressure << 31) - var2) * 3125
+        pressure = abs(numerator) // abs(var1)
+        if (numerator < 0) != (var1 < 0):
+            pressure = -pressure
+        var1 = (p9 * (pressure >> 13) * (pressure >> 13)) >> 25
+        var2 = (p8 * pressure) >> 19
+        return ((pressure + var1 + var2) >> 8) + (p7 << 4)
+
+    def compensate(self, raw_temperature: int, raw_pressure: int) -> float:
+        """
+        Converts a pair of raw readings to Pascal with the selected compensation mode.
+        This does not access the chip, so it can be used on recorded raw readings as well.
+        :param raw_temperature: The raw temperature value
+        :param raw_pressure: The raw pressure value
+        :return: The pressure in Pascal
+        """
+        if self.compensation_mode == CompensationMode.INTEGER:
+            t_fine = self.__compensate_temperature_int(raw_temperature)
+            return self.__compensate_pressure_int(raw_pressure, t_fine) / 256.0
+        else:
+            temp_compensated = self.__compensate_temperature(raw_temperature)
+            return self.__compensate_pressure(raw_pressure, temp_compensated)
+
+    def compensate_batch(self, raw_temps, raw_pressures):
+        """
+        Vectorized variant of compensate for converting large amounts of recorded raw readings at once.
+        NumPy is only needed for this, so it's imported here instead of slowing down the import on the device.
+        :param raw_temps: Array-like of raw temperature values
+        :param raw_pressures: Array-like of raw pressure values, same length as the temperatures
+        :return: NumPy array of the pressures in Pascal
+        """
+        import numpy as np
+
+        raw_temps = np.asarray(raw_temps, dtype=np.int64)
+        raw_pressures = np.asarray(raw_pressures, dtype=np.int64)
+        if raw_temps.shape != raw_pressures.shape:
+            raise Exception("Raw temperatures and pressures must have the same shape")
+
+        if self.compensation_mode == CompensationMode.INTEGER:
+            t1, t2, t3 = self.__tempCalibData
+            p1, p2, p3, p4, p5, p6, p7, p8, p9 = self.__presCalibData
+
+            var1 = (((raw_temps >> 3) - (t1 << 1)) * t2) >> 11
+            var2 = (raw_temps >> 4) - t1
+            var2 = (((var2 * var2) >> 12) * t3) >> 14
+            t_fine = var1 + var2
+
+            var1 = t_fine - 128000
+            var2 = var1 * var1 * p6
+            var2 = var2 + ((var1 * p5) << 17)
+            var2 = var2 + (p4 << 35)
+            var1 = ((var1 * var1 * p3) >> 8) + ((var1 * p2) << 12)
+            var1 = (((1 << 47) + var1) * p1) >> 33
+            valid = var1 != 0
+            divisor = np.where(valid, var1, 1)
+            numerator = (((1048576 - raw_pressures) << 31) - var2) * 3125
+            # C division truncates towards zero, NumPy's floor division doesn't
+            pressure = np.abs(numerator) // np.abs(divisor) * (np.sign(numerator) * np.sign(divisor))
+            var1 = (p9 * (pressure >> 13) * (pressure >> 13)) >> 25
+            var2 = (p8 * pressure) >> 19
+            pressure = ((pressure + var1 + var2) >> 8) + (p7 << 4)
+            return np.where(valid, pressure, 0) / 256.0
+
+        t_a, t_b, t_c, t_d = self.__tempScaled
+        v2_a, v2_b, v2_c, v1_a, v1_b, v1_c, p_a, p_b, p_c = self.__presScaled
+
+        raw_temps = raw_temps.astype(np.float64)
+        var2 = raw_temps / 131072.0 - t_c
+        temp_compensated = raw_temps * t_a - t_b + var2 * var2 * t_d
+
+        var1 = temp_compensated / 2.0 - 64000.0
+        var2 = (v2_a * var1 + v2_b) * var1 + v2_c
+        var1 = (v1_a * var1 + v1_b) * var1 + v1_c
+        valid = var1 != 0
+        pressure = 1048576.0 - raw_pressures
+        pressure = (pressure - var2 / 4096.0) * 6250.0 / np.where(valid, var1, 1.0)
+        pressure = pressure + (p_a * pressure + p_b) * pressure + p_c
+        return np.where(valid, pressure, 0.0)
+
+    def __measure_forced(self):
+        """
+        Triggers a single measurement in forced mode and waits until it's guaranteed to be finished.
+        The chip returns to sleep mode afterwards by itself.
+        :return: None
+        """
+        configuration = self.get_configuration()
+        self.write_single_byte(Registers.CONTROL, configuration.get_control_register())
+        time.sleep(configuration.get_measurement_time(maximum=True))
+
+    def get_last_raw_reading(self) -> Optional[tuple]:
+        """
+        :return: The raw temperature and pressure the last pressure reading was compensated from
+        """
+        if self.__last_raw_pres is None:
+            return None
+        return self.__last_raw_temp, self.__last_raw_pres
+
     def read_temperature(self):
         """
         :return: The temperature in Celsius
         """
+        if self.get_configuration().power_mode == PowerMode.FORCED:
+            self.__measure_forced()
         raw = self.__read_temp_raw()
+        if self.compensation_mode == CompensationMode.INTEGER:
+            t_fine = self.__compensate_temperature_int(raw)
+            return ((t_fine * 5 + 128) >> 8) / 100.0
         comp = self.__compensate_temperature(raw)
         return comp / 5120.0
 
     def get_pressure_in_Pascal(self):
         """
+        Reads temperature and pressure in one burst and compensates the pressure.
+        If temperature_refresh_interval is larger than 1, only the pressure is read for most samples and the last
+        compensated temperature is reused.
         :return: The pressure in Pascal
         """
-        raw_temp = self.__read_temp_raw()
-        comp_temp = self.__compensate_temperature(raw_temp)
-        raw_pres = self.read_pressure_raw()
-        comp_pres = self.__compensate_pressure(raw_pres, comp_temp)
-        return comp_pres
+        if self.get_configuration().power_mode == PowerMode.FORCED:
+            self.__measure_forced()
+
+        integer_mode = self.compensation_mode == CompensationMode.INTEGER
+        if self.__last_temp_compensated is None or self.__last_temp_mode != self.compensation_mode or \
+                self.__samples_since_temp_refresh + 1 >= self.temperature_refresh_interval:
+            raw_temp, raw_pres = self.read_raw_burst()
+            self.__last_raw_temp = raw_temp
+            if integer_mode:
+                self.__last_temp_compensated = self.__compensate_temperature_int(raw_temp)
+            else:
+                self.__last_temp_compensated = self.__compensate_temperature(raw_temp)
+            self.__last_temp_mode = self.compensation_mode
+            self.__samples_since_temp_refresh = 0
+        else:
+            raw_pres = self.read_pressure_raw()
+            self.__samples_since_temp_refresh += 1
+        self.__last_raw_pres = raw_pres
+
+        if integer_mode:
+            return self.__compensate_pressure_int(raw_pres, self.__last_temp_compensated) / 256.0
+        return self.__compensate_pressure(raw_pres, self.__last_temp_compensated)
@@ -1,15 +1,28 @@
+from typing import Optional
+
 import smbus
 
-from bmp280.BMP280Base import BMP280Base, SamplingMode
+from bmp280.BMP280Base import BMP280Base, SensorConfiguration
 
 
 class BMP280_I2C(BMP280Base):
-    __address: int = 0x76  # Hardcoded in the chip
+    __address: int = 0x76  # Depends on the SDO pin, 0x76 when pulled low, 0x77 when pulled high
+    __bus_number: int
 
     __bus: smbus.SMBus
 
-    def __init__(self, bus_number: int):
-        self.__bus = smbus.SMBus(bus_number)
+    # Sensors on the same bus share its handle
+    __open_buses: {int: smbus.SMBus} = {}
+
+    def __init__(self, bus_number: int, address: int = 0x76):
+        self.__bus_number = bus_number
+        self.__address = address
+        if bus_number not in self.__open_buses:
+            self.__open_buses[bus_number] = smbus.SMBus(bus_number)
+        self.__bus = self.__open_buses[bus_number]
+
+    def get_bus_name(self) -> str:
+        return "i2c-" + self.__bus_number.__str__()
 
     def read_single_byte(self, addr: int):
         return self.__bus.read_byte_data(self.__address, addr)
@@ -21,12 +34,10 @@ class BMP280_I2C(BMP280Base):
         self.__bus.write_byte_data(self.__address, addr, value)
 
     @staticmethod
-    def create_default():
-        bmp = BMP280_I2C(1)
-        bmp.__temperatureMode = SamplingMode.X_2
-        bmp.__pressureMode = SamplingMode.X_2
+    def create_default(configuration: Optional[SensorConfiguration] = None, address: int = 0x76):
+        bmp = BMP280_I2C(1, address)
 
-        bmp.configure_sensor()
+        bmp.configure_sensor(configuration)
         if not bmp.check_chip_id():
             raise Exception("Error reading chip ID from BMP 280. This is a sign for connection problems.")
         return bmp
@@ -1,17 +1,24 @@
+from typing import Optional
+
 import spidev
 
-from bmp280.BMP280Base import BMP280Base, SamplingMode
+from bmp280.BMP280Base import BMP280Base, SensorConfiguration
 
 
 class BMP280_SPI(BMP280Base):
     __bus: spidev
+    __bus_number: int
 
     def __init__(self, bus_number: int, bus_address: int, bus_mode: int, bus_speed: int):
+        self.__bus_number = bus_number
         self.__bus = spidev.SpiDev()
         self.__bus.open(bus_number, bus_address)
         self.__bus.max_speed_hz = bus_speed
         self.__bus.mode = bus_mode
 
+    def get_bus_name(self) -> str:
+        return "spi-" + self.__bus_number.__str__()
+
     def read_single_byte(self, addr: int):
         # reading must have the highest bit set to 1
         # after that we clock out the result
@@ -30,12 +37,8 @@ class BMP280_SPI(BMP280Base):
         self.__bus.xfer2([addr & 0b0111_1111, value])
 
     @staticmethod
-    def create_default():
+    def create_default(configuration: Optional[SensorConfiguration] = None):
         bmp = BMP280_SPI(0, 0, 0b00, 500_000)
-        bmp.__busNum = 0
-        bmp.__address = 0
-        bmp.__temperatureMode = SamplingMode.X_2
-        bmp.__pressureMode = SamplingMode.X_2
 
-        bmp.configure_sensor()
+        bmp.configure_sensor(configuration)
         return bmp
@@ -0,0 +1,63 @@
+import sys
+import time
+from threading import Lock
+
+
+class BootPhase:
+    """
+    The end of a phase of the startup, e.g. the first sensor reading.
+    Worker processes send these to the main process, which collects them in its BootTimeline.
+    The timestamp is taken with time.monotonic, which counts from the system boot on Linux and can thus be compared
+    across processes.
+    """
+    name: str
+    timestamp: float
+
+    def __init__(self, name: str, timestamp: float = None):
+        self.name = name
+        self.timestamp = timestamp if timestamp is not None else time.monotonic()
+
+
+class BootTimeline:
+    """
+    Collects the phases of the startup from all processes and prints when each of them ended.
+    Every phase is only recorded the first time it's reached, so it can be marked from code that runs repeatedly.
+    """
+    __phases: {str: float}
+    __lock: Lock
+
+    def __init__(self):
+        self.__phases = {}
+        self.__lock = Lock()
+
+    def mark(self, name: str, timestamp: float = None) -> bool:
+        """
+        Records the end of a phase
+        :param name: Name of the phase
+        :param timestamp: Monotonic time the phase ended, now if None
+        :return: Whether the phase was reached for the first time
+        """
+        with self.__lock:
+            if name in self.__phases:
+                return False
+            self.__phases[name] = timestamp if timestamp is not None else time.monotonic()
+            return True
+
+    def add(self, phase: BootPhase) -> bool:
+        """Records a phase received from a worker process, see mark"""
+        return self.mark(phase.name, phase.timestamp)
+
+    def __contains__(self, name: str) -> bool:
+        with self.__lock:
+            return name in self.__phases
+
+    def dump(self, output=sys.stdout):
+        """Prints the phases in the order they ended with the time since boot and since the previous phase"""
+        with self.__lock:
+            phases = sorted(self.__phases.items(), key=lambda phase: phase[1])
+        previous = phases[0][1] if phases else 0.0
+        for name, timestamp in phases:
+            output.write(format(timestamp, '9.3f') + "s  +" + format((timestamp - previous) * 1000.0, '.0f') +
+                         "ms  " + name + "\n")
+            previous = timestamp
+        output.flush()
@@ -0,0 +1,139 @@
+import asyncio
+import sys
+from multiprocessing.connection import Connection
+from typing import Callable, Awaitable, Optional
+
+
+class EventRuntime:
+    """
+    Waits on the connections of the worker processes and dispatches the received events to coroutine handlers.
+
+    Every connection is watched by the asyncio loop directly, so events take a single hop from the worker to their
+    handler and no threads are involved. The events of one connection are handled one after another in the order
+    they were sent, while different connections and timers run concurrently.
+    """
+    __connections: [Connection]
+    __handlers: [(type, Callable[[object], Awaitable[None]])]
+    __timers: [(float, bool, Callable[[], Awaitable[None]])]
+    __signal_handlers: {int: [Callable[[], None]]}
+    __loop: Optional[asyncio.AbstractEventLoop] = None
+    __tasks: [asyncio.Task]  # The loop only keeps weak references to its tasks
+    __stopped: Optional[asyncio.Event] = None
+
+    def __init__(self):
+        self.__connections = []
+        self.__handlers = []
+        self.__timers = []
+        self.__signal_handlers = {}
+        self.__tasks = []
+
+    def add_connection(self, connection: Connection):
+        """
+        Adds the receiving end of a worker's pipe as an event source
+        :param connection: The connection to receive events from
+        :return: None
+        """
+        self.__connections.append(connection)
+        if self.__loop is not None:
+            self.__tasks.append(self.__loop.create_task(self.__consume(connection)))
+
+    def add_handler(self, event_type: type, handler: Callable[[object], Awaitable[None]]):
+        """
+        Registers a coroutine function for all events that are instances of the given type.
+        An event is passed to every matching handler in the order of registration.
+        :param event_type: The (base) class of the events to handle
+        :param handler: The coroutine function to call with the event
+        :return: None
+        """
+        self.__handlers.append((event_type, handler))
+
+    def add_timer(self, delay: float, callback: Callable[[], Awaitable[None]], repeat: bool = False):
+        """
+        Calls a coroutine function after a delay
+        :param delay: The delay in seconds
+        :param callback: The coroutine function to call
+        :param repeat: Whether to call it again every delay seconds
+        :return: None
+        """
+        self.__timers.append((delay, repeat, callback))
+        if self.__loop is not None:
+            self.__tasks.append(self.__loop.create_task(self.__run_timer(delay, repeat, callback)))
+
+    def add_signal_handler(self, signum: int, handler: Callable[[], None]):
+        """
+        Calls a function whenever the process receives a signal.
+        Unlike a handler set with signal.signal, it runs in the loop between two events rather than interrupting
+        whatever the main thread is doing, so it can safely take locks the event handlers take, too.
+        :param signum: The signal, e.g. signal.SIGUSR1
+        :param handler: The function to call, handlers of the same signal are called in the order of registration
+        :return: None
+        """
+        if signum not in self.__signal_handlers:
+            self.__signal_handlers[signum] = []
+            if self.__loop is not None:
+                self.__loop.add_signal_handler(signum, self.__handle_signal, signum)
+        self.__signal_handlers[signum].append(handler)
+
+    def __handle_signal(self, signum: int):
+        for handler in self.__signal_handlers[signum]:
+            try:
+                handler()
+            except Exception as e:
+                sys.stderr.write("Exception handling signal " + signum.__str__() + ": " + e.__str__() + "\n")
+
+    async def dispatch(self, event: object):
+        for event_type, handler in self.__handlers:
+            if isinstance(event, event_type):
+                try:
+                    await handler(event)
+                except Exception as e:
+                    sys.stderr.write("Exception handling " + event.__class__.__name__ + ": " + e.__str__() + "\n")
+
+    async def __wait_readable(self, connection: Connection):
+        readable = self.__loop.create_future()
+        self.__loop.add_reader(connection.fileno(), lambda: readable.done() or readable.set_result(None))
+        try:
+            await readable
+        finally:
+            self.__loop.remove_reader(connection.fileno())
+
+    async def __consume(self, connection: Connection):
+        while True:
+            await self.__wait_readable(connection)
+            # Handle everything that's already there before going back to waiting
+            while connection.poll():
+                try:
+                    event = connection.recv()
+                except EOFError:
+                    sys.stderr.write("Worker connection closed\n")
+                    return
+                await self.dispatch(event)
+
+    async def __run_timer(self, delay: float, repeat: bool, callback: Callable[[], Awaitable[None]]):
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await callback()
+            except Exception as e:
+                sys.stderr.write("Exception in timer: " + e.__str__() + "\n")
+            if not repeat:
+                return
+
+    async def __main(self):
+        self.__loop = asyncio.get_running_loop()
+        self.__tasks += [self.__loop.create_task(self.__consume(c)) for c in self.__connections]
+        self.__tasks += [self.__loop.create_task(self.__run_timer(*timer)) for timer in self.__timers]
+        for signum in self.__signal_handlers:
+            self.__loop.add_signal_handler(signum, self.__handle_signal, signum)
+        # Runs until stopped, the consumers and repeating timers never finish on their own
+        self.__stopped = asyncio.Event()
+        await self.__stopped.wait()
+
+    def run(self):
+        """Runs the event loop until stop is called"""
+        asyncio.run(self.__main())
+
+    def stop(self):
+        """Makes run return, must be called from within the loop, e.g. from a handler"""
+        if self.__stopped is not None:
+            self.__stopped.set()
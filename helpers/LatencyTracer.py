@@ -0,0 +1,105 @@
+import bisect
+import sys
+import time
+from threading import Lock
+
+
+class TracedMessage:
+    """
+    Base class for messages whose way through the system gets timed.
+    Every hop adds a stamp with its name and the time it saw the message. The timestamps are taken with
+    time.monotonic, which uses the system wide monotonic clock on Linux and can thus be compared across processes.
+    """
+    trace: [(str, float)]
+
+    def __init__(self):
+        self.trace = []
+
+    def stamp(self, hop: str, timestamp: float = None):
+        """
+        Records that the message passed a hop
+        :param hop: Name of the hop
+        :param timestamp: Time of passing the hop, now if None
+        :return: None
+        """
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self.trace.append((hop, timestamp))
+
+
+class LatencyHistogram:
+    """Histogram with fixed, roughly logarithmic buckets for latencies"""
+
+    # Upper bucket bounds in milliseconds, the last bucket takes everything above
+    bounds_ms: [float] = [0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, latency_ms: float):
+        self.counts[bisect.bisect_left(self.bounds_ms, latency_ms)] += 1
+        self.count += 1
+        self.sum_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def get_percentile(self, fraction: float) -> float:
+        """
+        :param fraction: The percentile as fraction between 0 and 1
+        :return: Upper bound of the bucket the percentile falls into in milliseconds
+        """
+        threshold = fraction * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= threshold and bucket_count:
+                return self.bounds_ms[i] if i < len(self.bounds_ms) else self.max_ms
+        return 0.0
+
+    def format(self) -> str:
+        mean = self.sum_ms / self.count if self.count else 0.0
+        return ("n=" + self.count.__str__() + " mean=" + format(mean, '.2f') + "ms p50<=" +
+                format(self.get_percentile(0.5), 'g') + "ms p90<=" + format(self.get_percentile(0.9), 'g') +
+                "ms p99<=" + format(self.get_percentile(0.99), 'g') + "ms max=" + format(self.max_ms, '.2f') + "ms")
+
+
+class LatencyTracer:
+    """
+    Collects the traces of finished messages into one latency histogram per hop and one for the whole way.
+    Messages can be finished from other threads, e.g. from VLC's event callbacks.
+    """
+
+    def __init__(self):
+        self.__lock = Lock()
+        self.__histograms: {(str, str): LatencyHistogram} = {}
+
+    def record(self, message: TracedMessage):
+        """
+        Adds the latencies between the hops of a message to the histograms
+        :param message: A message that has passed all the hops it's going to pass
+        :return: None
+        """
+        if len(message.trace) < 2:
+            return
+        with self.__lock:
+            pairs = list(zip(message.trace, message.trace[1:]))
+            if len(message.trace) > 2:
+                pairs.append((message.trace[0], message.trace[-1]))
+            for (start_hop, start_time), (end_hop, end_time) in pairs:
+                key = (start_hop, end_hop)
+                if key not in self.__histograms:
+                    self.__histograms[key] = LatencyHistogram()
+                self.__histograms[key].add((end_time - start_time) * 1000.0)
+
+    def dump(self, output=sys.stdout):
+        """Prints all histograms"""
+        bounds = LatencyHistogram.bounds_ms
+        labels = ["<=" + format(bound, 'g') + "ms" for bound in bounds] + [">" + format(bounds[-1], 'g') + "ms"]
+        with self.__lock:
+            for (start_hop, end_hop), histogram in self.__histograms.items():
+                output.write(start_hop + " -> " + end_hop + ": " + histogram.format() + "\n")
+                output.write("    " + " ".join(label + ":" + count.__str__()
+                                               for label, count in zip(labels, histogram.counts) if count) + "\n")
+            output.flush()
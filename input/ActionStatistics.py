@@ -0,0 +1,131 @@
+from array import array
+from typing import Optional
+
+
+class ActionStatistics:
+    """
+    Running statistics of the pressure differentials during a single sip or puff.
+
+    Count, mean, minimum, maximum and peak cover the whole action and are updated incrementally, so querying them
+    is O(1) no matter how long the action lasts. The most recent readings are kept in a fixed size ring buffer,
+    which bounds the memory and provides the slope of the recent pressure trend.
+
+    Attributes:
+        capacity    Number of recent readings kept for the slope
+    """
+    capacity: int
+
+    __times: array
+    __values: array
+    __next_index: int = 0
+    __window_count: int = 0
+
+    __start_time: float = 0.0
+    __count: int = 0
+    __sum: float = 0.0
+    __min: float = 0.0
+    __max: float = 0.0
+
+    # Sums over the window for the least squares slope. Times are relative to the start of the action to keep
+    # the magnitudes and with them the cancellation errors small.
+    __window_sum_t: float = 0.0
+    __window_sum_v: float = 0.0
+    __window_sum_tt: float = 0.0
+    __window_sum_tv: float = 0.0
+
+    def __init__(self, capacity: int = 256):
+        if capacity < 2:
+            raise Exception("Action statistics need a capacity of at least 2")
+        self.capacity = capacity
+        self.__times = array('d', bytes(8 * capacity))
+        self.__values = array('d', bytes(8 * capacity))
+
+    def clear(self):
+        self.__next_index = 0
+        self.__window_count = 0
+        self.__count = 0
+        self.__sum = 0.0
+        self.__min = 0.0
+        self.__max = 0.0
+        self.__window_sum_t = 0.0
+        self.__window_sum_v = 0.0
+        self.__window_sum_tt = 0.0
+        self.__window_sum_tv = 0.0
+
+    def add(self, value: float, timestamp: float):
+        """
+        Adds a reading to the current action.
+        :param value: Pressure differential in Pascal
+        :param timestamp: Time of the reading in seconds
+        :return: None
+        """
+        if self.__count == 0:
+            self.__start_time = timestamp
+            self.__min = value
+            self.__max = value
+        else:
+            self.__min = min(self.__min, value)
+            self.__max = max(self.__max, value)
+        self.__count += 1
+        self.__sum += value
+
+        t = timestamp - self.__start_time
+        if self.__window_count == self.capacity:
+            # Evict the oldest reading, which is the one about to be overwritten
+            old_t = self.__times[self.__next_index]
+            old_v = self.__values[self.__next_index]
+            self.__window_sum_t -= old_t
+            self.__window_sum_v -= old_v
+            self.__window_sum_tt -= old_t * old_t
+            self.__window_sum_tv -= old_t * old_v
+        else:
+            self.__window_count += 1
+
+        self.__times[self.__next_index] = t
+        self.__values[self.__next_index] = value
+        self.__next_index = (self.__next_index + 1) % self.capacity
+        self.__window_sum_t += t
+        self.__window_sum_v += value
+        self.__window_sum_tt += t * t
+        self.__window_sum_tv += t * value
+
+    def get_count(self) -> int:
+        return self.__count
+
+    def get_mean(self) -> float:
+        """
+        :return: Average pressure differential of the action, 0 if there were no readings yet
+        """
+        if self.__count < 1:
+            return 0
+        return self.__sum / self.__count
+
+    def get_min(self) -> float:
+        return self.__min
+
+    def get_max(self) -> float:
+        return self.__max
+
+    def get_peak(self) -> float:
+        """
+        :return: The reading with the highest magnitude, keeping its sign
+        """
+        return self.__max if abs(self.__max) >= abs(self.__min) else self.__min
+
+    def get_slope(self) -> Optional[float]:
+        """
+        :return: Least squares slope of the recent readings in Pascal per second, None with less than two readings
+        """
+        n = self.__window_count
+        denominator = n * self.__window_sum_tt - self.__window_sum_t * self.__window_sum_t
+        if n < 2 or denominator == 0:
+            return None
+        return (n * self.__window_sum_tv - self.__window_sum_t * self.__window_sum_v) / denominator
+
+    def get_recent_values(self) -> [float]:
+        """
+        :return: The readings in the ring buffer, oldest first
+        """
+        if self.__window_count < self.capacity:
+            return self.__values[:self.__window_count].tolist()
+        return (self.__values[self.__next_index:] + self.__values[:self.__next_index]).tolist()
@@ -0,0 +1,76 @@
+from typing import Optional
+
+from input.IAmbientPressureEstimator import IAmbientPressureEstimator
+
+
+class AlphaBetaReferenceFilter(IAmbientPressureEstimator):
+    """
+    Tracks the ambient pressure and its drift with an alpha-beta filter, the steady state form of a Kalman filter
+    for a constant-velocity model.
+
+    Residuals beyond the gate are clipped before they are applied. This bounds the influence of sipping and puffing
+    on the estimation, similar to the attenuation in SingleSensorReferenceFilter, while weather changes are tracked
+    by the drift term. Right after boot the gain starts at 1 and decreases like a running mean until it reaches
+    alpha, which lets the estimation settle within the first readings.
+
+    Attributes:
+        alpha   Gain of the pressure estimation per reading
+        beta    Gain of the drift estimation per reading
+        gate    Residuals are clipped to this magnitude in Pascal
+    """
+    alpha: float = 0.002
+    beta: float = 1e-7
+    gate: float = 100.0
+
+    __current_estimation: Optional[float] = None
+    __drift: float = 0.0  # Pascal per reading
+    __observation_count: int = 0
+
+    def update(self, reading: float):
+        if self.__current_estimation is None:
+            self.__current_estimation = reading
+            self.__observation_count = 1
+            return
+
+        self.__observation_count += 1
+        gain = max(self.alpha, 1.0 / self.__observation_count)
+
+        predicted = self.__current_estimation + self.__drift
+        residual = min(self.gate, max(-self.gate, reading - predicted))
+        self.__current_estimation = predicted + gain * residual
+        self.__drift += self.beta * residual
+
+    def get_ambient_pressure_estimation(self) -> float:
+        return self.__current_estimation
+
+    def update_batch(self, readings):
+        # The gate makes the recursion nonlinear, so it can't be vectorized. This loop only keeps the state in
+        # local variables, which is considerably faster than calling update for each reading.
+        import numpy as np
+
+        readings = np.asarray(readings, dtype=np.float64)
+        estimations = np.empty(len(readings), dtype=np.float64)
+        estimation = self.__current_estimation
+        drift = self.__drift
+        count = self.__observation_count
+        alpha = self.alpha
+        beta = self.beta
+        gate = self.gate
+
+        for i, reading in enumerate(readings.tolist()):
+            if estimation is None:
+                estimation = reading
+                count = 1
+            else:
+                count += 1
+                gain = max(alpha, 1.0 / count)
+                predicted = estimation + drift
+                residual = min(gate, max(-gate, reading - predicted))
+                estimation = predicted + gain * residual
+                drift += beta * residual
+            estimations[i] = estimation
+
+        self.__current_estimation = estimation
+        self.__drift = drift
+        self.__observation_count = count
+        return estimations
@@ -0,0 +1,141 @@
+from typing import Optional
+
+import numpy as np
+
+from input.IAmbientPressureEstimator import IAmbientPressureEstimator
+from input.PressureInput import PressureInput
+from input.SingleSensorReferenceFilter import SingleSensorReferenceFilter
+from input.SipPuffEvent import SipPuffEvent
+
+
+class BatchPressureInput:
+    """
+    Offline counterpart to PressureInput, which turns whole recorded traces into Sip-Puff input events at once.
+
+    The streaming state machine only changes its state at a few samples per action: when the pressure leaves the
+    idle band, when it falls back below the hysteresis and when an action becomes long. Instead of visiting every
+    sample, this class finds these transitions with array searches and only iterates over the actions.
+    The events are the same the streaming state machine emits for the same trace.
+
+    The attributes are the same as the thresholds of PressureInput and are copied from a PressureInput if one is
+    passed to the constructor.
+    """
+
+    short_action_min_time: float = 0.2
+    long_Action_min_time: float = 1.0
+
+    weak_action_thresh: float = 400
+    weak_action_hysteresis: float = 10
+
+    strong_action_thresh: float = 700
+    strong_action_hysteresis: float = 30
+
+    def __init__(self, template: Optional[PressureInput] = None):
+        if template is not None:
+            self.short_action_min_time = template.short_action_min_time
+            self.long_Action_min_time = template.long_Action_min_time
+            self.weak_action_thresh = template.weak_action_thresh
+            self.weak_action_hysteresis = template.weak_action_hysteresis
+            self.strong_action_thresh = template.strong_action_thresh
+            self.strong_action_hysteresis = template.strong_action_hysteresis
+
+    @staticmethod
+    def compute_reference(pressures, reference_filter: Optional[IAmbientPressureEstimator] = None) -> np.ndarray:
+        """
+        Runs an ambient pressure filter over a trace, just like PressureInput does while streaming.
+        :param pressures: The pressure readings in Pascal
+        :param reference_filter: The filter to use, a new SingleSensorReferenceFilter like PressureInput's default
+                                 if None
+        :return: The ambient pressure estimation after each reading
+        """
+        if reference_filter is None:
+            reference_filter = SingleSensorReferenceFilter()
+        return reference_filter.update_batch(pressures)
+
+    def __classify(self, avg_pressure: float, long: bool) -> Optional[SipPuffEvent]:
+        # Order matters here. Match the extreme conditions first!
+        if avg_pressure < -self.strong_action_thresh:
+            return SipPuffEvent.LONG_STRONG_SIP if long else SipPuffEvent.SHORT_STRONG_SIP
+        elif avg_pressure > self.strong_action_thresh:
+            return SipPuffEvent.LONG_STRONG_PUFF if long else SipPuffEvent.SHORT_STRONG_PUFF
+        elif avg_pressure < -self.weak_action_thresh:
+            return SipPuffEvent.LONG_WEAK_SIP if long else SipPuffEvent.SHORT_WEAK_SIP
+        elif avg_pressure > self.weak_action_thresh:
+            return SipPuffEvent.LONG_WEAK_PUFF if long else SipPuffEvent.SHORT_WEAK_PUFF
+        return None
+
+    def __find_long_reading(self, timestamps: np.ndarray, start: int) -> int:
+        """
+        Finds the first reading after the start of an action at which the action counts as long.
+        The binary search works on start time plus duration, while the streaming state machine compares the
+        difference of the timestamps. Both can round differently, so the result is corrected with the exact check.
+        :return: The index of the reading or the number of readings if the trace ends before
+        """
+        start_time = timestamps[start]
+        limit = self.long_Action_min_time
+        idx = max(int(np.searchsorted(timestamps, start_time + limit, side='right')), start + 1)
+        while idx > start + 1 and timestamps[idx - 1] - start_time > limit:
+            idx -= 1
+        while idx < len(timestamps) and not timestamps[idx] - start_time > limit:
+            idx += 1
+        return idx
+
+    def detect(self, timestamps, pressures, reference=None) -> [(float, SipPuffEvent)]:
+        """
+        Detects all events in a trace.
+        :param timestamps: Monotonic, non-decreasing time of each reading in seconds
+        :param pressures: The pressure readings in Pascal
+        :param reference: The ambient pressure estimation for each reading. Computed with the same filter
+                          PressureInput uses if None.
+        :return: The emitted events together with the timestamps of the readings that triggered them
+        """
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        pressures = np.asarray(pressures, dtype=np.float64)
+        if reference is None:
+            reference = self.compute_reference(pressures)
+        pdiff = pressures - np.asarray(reference, dtype=np.float64)
+        magnitude = np.abs(pdiff)
+
+        # Readings that start an action and readings that end one
+        starts = np.flatnonzero(magnitude >= self.weak_action_thresh)
+        stops = np.flatnonzero(magnitude < self.weak_action_thresh - self.weak_action_hysteresis)
+        sample_count = len(pdiff)
+
+        events: [(float, SipPuffEvent)] = []
+        position = 0
+        while True:
+            # IDLE: wait for the next reading outside of the idle band
+            idx = np.searchsorted(starts, position)
+            if idx >= len(starts):
+                break
+            start = starts[idx]
+            start_time = timestamps[start]
+
+            # MEASURING: ends with the first reading below the hysteresis or the first reading past the long time
+            idx = np.searchsorted(stops, start + 1)
+            stop = stops[idx] if idx < len(stops) else sample_count
+            long_at = self.__find_long_reading(timestamps, start)
+
+            if long_at <= stop and long_at < sample_count:
+                # The reading that makes the action long isn't part of the average
+                event = self.__classify(float(pdiff[start:long_at].mean()), True)
+                if event is not None:
+                    events.append((float(timestamps[long_at]), event))
+
+                # FINISHED_WAITING: wait until the pressure falls below the hysteresis
+                idx = np.searchsorted(stops, long_at + 1)
+                if idx >= len(stops):
+                    break
+                position = stops[idx] + 1
+            elif stop < sample_count:
+                # The reading that ends the action isn't part of the average either
+                if timestamps[stop] - start_time >= self.short_action_min_time:
+                    event = self.__classify(float(pdiff[start:stop].mean()), False)
+                    if event is not None:
+                        events.append((float(timestamps[stop]), event))
+                position = stop + 1
+            else:
+                # The trace ended during an action
+                break
+
+        return events
@@ -0,0 +1,35 @@
+from abc import ABC, abstractmethod
+
+
+class IAmbientPressureEstimator(ABC):
+    """Interface for filters that estimate the ambient pressure from the readings of the sip-puff sensor"""
+
+    @abstractmethod
+    def update(self, reading: float):
+        """
+        Updates the estimation by processing the given pressure measurement
+        :param reading: The pressure reading in Pascal
+        :return: None
+        """
+        pass
+
+    @abstractmethod
+    def get_ambient_pressure_estimation(self) -> float:
+        """This should only called after at least one call to update with an actual sensor reading"""
+        pass
+
+    def update_batch(self, readings):
+        """
+        Processes many readings at once, leaving the estimator in the same state as calling update for each of them.
+        This implementation simply loops, implementations that can vectorize their computation should override it.
+        :param readings: Array-like of pressure readings in Pascal
+        :return: NumPy array of the estimations after each reading
+        """
+        import numpy as np
+
+        readings = np.asarray(readings, dtype=np.float64)
+        estimations = np.empty(len(readings), dtype=np.float64)
+        for i, reading in enumerate(readings.tolist()):
+            self.update(reading)
+            estimations[i] = self.get_ambient_pressure_estimation()
+        return estimations
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 
 
 class IPressureSensor(ABC):
@@ -7,3 +8,24 @@ class IPressureSensor(ABC):
     @abstractmethod
     def get_pressure_in_Pascal(self) -> float:
         pass
+
+    def get_last_raw_reading(self) -> Optional[tuple]:
+        """
+        Sensors that compensate raw readings can return the raw values behind the last pressure reading here,
+        e.g. for recording them.
+        :return: A tuple of the raw temperature and raw pressure or None if not supported
+        """
+        return None
+
+    def get_sample_period(self) -> Optional[float]:
+        """
+        :return: The time in seconds after which the sensor has a new reading, None if unknown
+        """
+        return None
+
+    def get_bus_name(self) -> Optional[str]:
+        """
+        Sensors on the same bus return the same name, so their reads can be grouped.
+        :return: A name identifying the bus the sensor is connected to, None if not applicable
+        """
+        return None
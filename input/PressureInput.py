@@ -1,8 +1,10 @@
 import time
 from enum import Enum, auto
-from typing import Optional
+from typing import Optional, Callable
 
 from input import IPressureSensor
+from input.ActionStatistics import ActionStatistics
+from input.IAmbientPressureEstimator import IAmbientPressureEstimator
 from input.SingleSensorReferenceFilter import SingleSensorReferenceFilter
 from input.SipPuffEvent import SipPuffEvent, SipPuffListener
 
@@ -31,10 +33,11 @@ class PressureInput:
     """
 
     __pressure_sensor: IPressureSensor  # Sensor to detect puffing and sipping
-    __reference_pressure_filter = SingleSensorReferenceFilter()  # Filter for estimating the ambient pressure
+    __clock: Callable[[], float]  # Monotonic time source in seconds, replaceable for replaying recordings
+    __reference_pressure_filter: IAmbientPressureEstimator  # Filter for estimating the ambient pressure
     __current_state: InputState = InputState.IDLE
     __action_start_time: Optional[float] = None  # Internal bookkeeping, start of the current action
-    __action_pressure_history: [float] = []  # History of pressure values during the current action
+    __action_statistics: ActionStatistics  # Running statistics of the pressure values during the current action
 
     debug: bool = False
 
@@ -47,10 +50,19 @@ class PressureInput:
     strong_action_thresh: float = 700
     strong_action_hysteresis: float = 30
 
-    __listeners: [SipPuffListener] = []
+    __listeners: [SipPuffListener]
 
-    def __init__(self, sensor: IPressureSensor):
+    def __init__(self, sensor: IPressureSensor, clock: Callable[[], float] = time.perf_counter,
+                 reference_filter: Optional[IAmbientPressureEstimator] = None):
         self.__pressure_sensor = sensor
+        self.__clock = clock
+        if reference_filter is None:
+            reference_filter = SingleSensorReferenceFilter()
+        self.__reference_pressure_filter = reference_filter
+        self.__current_state = InputState.IDLE
+        self.__action_start_time = None
+        self.__action_statistics = ActionStatistics()
+        self.__listeners = []
 
     def __notify_listeners(self, event: SipPuffEvent):
         if self.debug:
@@ -68,6 +80,16 @@ class PressureInput:
         :return: None, A side effect of this method might be the emission of a :class:SipPuffEvent to listeners
         """
         sensor_value = self.__pressure_sensor.get_pressure_in_Pascal()
+        self.process(sensor_value, self.__clock())
+
+    def process(self, sensor_value: float, now: float):
+        """
+        Processes a reading that was taken from the underlying sensor elsewhere, e.g. when several sensors are read
+        in one go.
+        :param sensor_value: The pressure reading in Pascal
+        :param now: The time of the reading according to this input's clock
+        :return: None, A side effect of this method might be the emission of a :class:SipPuffEvent to listeners
+        """
         self.__reference_pressure_filter.update(sensor_value)
 
         reference_value = self.__reference_pressure_filter.get_ambient_pressure_estimation()
@@ -79,30 +101,38 @@ class PressureInput:
             print("Pressure difference: " + str(pdiff))
 
         if self.__current_state == InputState.IDLE:
-            self.__update_IDLE(pdiff)
+            self.__update_IDLE(pdiff, now)
         elif self.__current_state == InputState.MEASURING:
-            self.__update_MEASURING(pdiff)
+            self.__update_MEASURING(pdiff, now)
         elif self.__current_state == InputState.FINISHED_WAITING:
             self.__update_FINISHED_WAITING(pdiff)
         else:
             raise Exception("Untreated enum value for input state: " + self.__current_state.__str__())
 
+    def get_sensor(self) -> IPressureSensor:
+        return self.__pressure_sensor
+
+    def get_clock(self) -> Callable[[], float]:
+        return self.__clock
+
     def get_current_duration(self) -> Optional[float]:
         if self.__action_start_time is None:
             return None
         else:
-            return time.perf_counter() - self.__action_start_time
+            return self.__clock() - self.__action_start_time
 
-    def __get_action_avg_pressure(self) -> float:
-        if len(self.__action_pressure_history) < 1:
-            return 0
-        else:
-            return sum(self.__action_pressure_history) / len(self.__action_pressure_history)
+    def get_action_statistics(self) -> ActionStatistics:
+        """
+        Listeners can use this to get more features of the action that triggered an event. The statistics are
+        cleared with the next idle reading.
+        :return: Running statistics of the current action
+        """
+        return self.__action_statistics
 
-    def __update_IDLE(self, pdiff):
+    def __update_IDLE(self, pdiff, now):
         # clear bookkeeping
         self.__action_start_time = None
-        self.__action_pressure_history.clear()
+        self.__action_statistics.clear()
 
         # Ignore no sipping or puffing
         if abs(pdiff) < self.weak_action_thresh:
@@ -112,20 +142,20 @@ class PressureInput:
             print("Changing mode from to measuring for next cycle")
 
         # Start the timer and add the observation
-        self.__action_start_time = time.perf_counter()
-        self.__action_pressure_history.append(pdiff)
+        self.__action_start_time = now
+        self.__action_statistics.add(pdiff, now)
 
         # Change state to Measuring
         self.__current_state = InputState.MEASURING
 
-    def __update_MEASURING(self, pdiff):
+    def __update_MEASURING(self, pdiff, now):
         # Check if we are past the duration for a long event
-        if self.get_current_duration() > self.long_Action_min_time:
+        if now - self.__action_start_time > self.long_Action_min_time:
             self.__current_state = InputState.FINISHED_WAITING
             if self.debug:
                 print("Changing mode to waiting for next cycle")
 
-            avg_pressure = self.__get_action_avg_pressure()
+            avg_pressure = self.__action_statistics.get_mean()
 
             # Order matters here. Match the extreme conditions first!
             if avg_pressure < -self.strong_action_thresh:
@@ -146,10 +176,10 @@ class PressureInput:
             self.__current_state = InputState.IDLE
 
             # Have we cleared the minimum time for an action?
-            if self.get_current_duration() < self.short_action_min_time:
+            if now - self.__action_start_time < self.short_action_min_time:
                 return
 
-            avg_pressure = self.__get_action_avg_pressure()
+            avg_pressure = self.__action_statistics.get_mean()
             if avg_pressure < -self.strong_action_thresh:
                 self.__notify_listeners(SipPuffEvent.SHORT_STRONG_SIP)
             elif avg_pressure > self.strong_action_thresh:
@@ -165,7 +195,7 @@ class PressureInput:
 
         # Append measurement at the end if we do not stop
         # We want to ignore the measurement that's falling below the threshold
-        self.__action_pressure_history.append(pdiff)
+        self.__action_statistics.add(pdiff, now)
 
     def __update_FINISHED_WAITING(self, pdiff):
         # This state is for waiting out the time after a long input
@@ -0,0 +1,168 @@
+"""
+Recording of pressure readings into a compact binary log and replaying such logs as a sensor.
+
+The log starts with a header:
+    magic (4 bytes), format version (uint16), flags (uint16), 3 temperature and 9 pressure calibration values (int32)
+followed by fixed size records:
+    timestamp in seconds (float64), raw temperature (int32), raw pressure (int32), pressure in Pascal (float64)
+Everything is little endian. Raw values are -1 if the recorded sensor doesn't provide them.
+"""
+import mmap
+import struct
+import time
+from pathlib import Path
+from typing import Optional, Callable, Iterator
+
+from input.IPressureSensor import IPressureSensor
+
+LOG_MAGIC = b"SPPR"
+LOG_VERSION = 1
+LOG_FLAG_HAS_CALIBRATION = 0b1
+
+HEADER_FORMAT = struct.Struct("<4sHH12i")
+RECORD_FORMAT = struct.Struct("<diid")
+
+
+class RecordingPressureSensor(IPressureSensor):
+    """
+    Wraps another sensor and appends every reading to a binary log.
+
+    Attributes:
+        flush_interval      Number of records after which the log is flushed to disk. Records that
+                            weren't flushed yet are lost on a hard power off.
+    """
+    flush_interval: int = 100
+
+    __sensor: IPressureSensor
+    __clock: Callable[[], float]
+    __file = None
+    __unflushed_records: int = 0
+
+    def __init__(self, sensor: IPressureSensor, log_path: Path, clock: Callable[[], float] = time.perf_counter):
+        self.__sensor = sensor
+        self.__clock = clock
+
+        # Store the calibration data if the sensor has any, so raw values can be compensated again later
+        flags = 0
+        calibration = [0] * 12
+        get_calibration_data = getattr(sensor, "get_calibration_data", None)
+        if get_calibration_data is not None:
+            temp_calib, pres_calib = get_calibration_data()
+            calibration = list(temp_calib) + list(pres_calib)
+            flags |= LOG_FLAG_HAS_CALIBRATION
+
+        self.__file = open(log_path, 'xb')
+        self.__file.write(HEADER_FORMAT.pack(LOG_MAGIC, LOG_VERSION, flags, *calibration))
+        # Flush right away, so a fork doesn't end up with the header buffered twice
+        self.__file.flush()
+
+    def get_pressure_in_Pascal(self) -> float:
+        pressure = self.__sensor.get_pressure_in_Pascal()
+        timestamp = self.__clock()
+        raw = self.__sensor.get_last_raw_reading()
+        raw_temp, raw_pres = raw if raw is not None else (-1, -1)
+
+        self.__file.write(RECORD_FORMAT.pack(timestamp, raw_temp, raw_pres, pressure))
+        self.__unflushed_records += 1
+        if self.__unflushed_records >= self.flush_interval:
+            self.__file.flush()
+            self.__unflushed_records = 0
+        return pressure
+
+    def get_last_raw_reading(self) -> Optional[tuple]:
+        return self.__sensor.get_last_raw_reading()
+
+    def get_sample_period(self) -> Optional[float]:
+        return self.__sensor.get_sample_period()
+
+    def get_bus_name(self) -> Optional[str]:
+        return self.__sensor.get_bus_name()
+
+    def close(self):
+        self.__file.close()
+
+
+class ReplayPressureSensor(IPressureSensor):
+    """
+    Sensor that plays back a log written by RecordingPressureSensor.
+    The log is memory mapped, so even hours of recordings are neither read nor parsed up front.
+    get_time returns the timestamp of the last returned reading and is meant to be used as the clock of
+    PressureInput, which makes the replay independent of real time.
+    """
+    __file = None
+    __map: mmap.mmap
+    __record_count: int
+    __position: int = 0
+    __current_time: float = 0.0
+    __last_raw: Optional[tuple] = None
+
+    flags: int
+    temp_calibration: [int]
+    pres_calibration: [int]
+
+    def __init__(self, log_path: Path):
+        self.__file = open(log_path, 'rb')
+        self.__map = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self.flags, *calibration = HEADER_FORMAT.unpack_from(self.__map, 0)
+        if magic != LOG_MAGIC:
+            raise Exception("Not a pressure log: " + log_path.__str__())
+        if version != LOG_VERSION:
+            raise Exception("Unsupported pressure log version: " + version.__str__())
+        self.temp_calibration = calibration[:3]
+        self.pres_calibration = calibration[3:]
+
+        # A record that was cut off by a power loss is ignored
+        self.__record_count = (len(self.__map) - HEADER_FORMAT.size) // RECORD_FORMAT.size
+
+    def has_calibration(self) -> bool:
+        return bool(self.flags & LOG_FLAG_HAS_CALIBRATION)
+
+    def get_record_count(self) -> int:
+        return self.__record_count
+
+    def get_record(self, index: int) -> (float, int, int, float):
+        """
+        :param index: Index of the record
+        :return: Timestamp, raw temperature, raw pressure and pressure in Pascal of the record
+        """
+        return RECORD_FORMAT.unpack_from(self.__map, HEADER_FORMAT.size + index * RECORD_FORMAT.size)
+
+    def get_record_array(self):
+        """
+        Returns all records as a NumPy structured array with the fields time, raw_temp, raw_pres and pressure.
+        The array is a view on the memory map, so nothing is copied, but it must not be used after close.
+        """
+        import numpy as np
+
+        dtype = np.dtype([("time", "<f8"), ("raw_temp", "<i4"), ("raw_pres", "<i4"), ("pressure", "<f8")])
+        return np.frombuffer(self.__map, dtype=dtype, count=self.__record_count, offset=HEADER_FORMAT.size)
+
+    def iter_records(self) -> Iterator[tuple]:
+        for index in range(self.__record_count):
+            yield self.get_record(index)
+
+    def has_more(self) -> bool:
+        return self.__position < self.__record_count
+
+    def rewind(self):
+        self.__position = 0
+
+    def get_time(self) -> float:
+        return self.__current_time
+
+    def get_pressure_in_Pascal(self) -> float:
+        if not self.has_more():
+            raise Exception("Pressure log is exhausted")
+        timestamp, raw_temp, raw_pres, pressure = self.get_record(self.__position)
+        self.__position += 1
+        self.__current_time = timestamp
+        self.__last_raw = (raw_temp, raw_pres) if raw_pres >= 0 else None
+        return pressure
+
+    def get_last_raw_reading(self) -> Optional[tuple]:
+        return self.__last_raw
+
+    def close(self):
+        self.__map.close()
+        self.__file.close()
@@ -0,0 +1,88 @@
+import statistics
+from collections import deque
+from typing import Optional
+
+from input.IAmbientPressureEstimator import IAmbientPressureEstimator
+
+
+class RollingMedianReferenceFilter(IAmbientPressureEstimator):
+    """
+    Estimates the ambient pressure as the median over the last few seconds of readings.
+
+    To keep the cost per reading low, the readings are grouped into blocks. Each full block is reduced to its median
+    and the estimation is the median of the last block medians. As long as sipping and puffing cover less than half
+    of the window, they don't affect the estimation at all. After boot the estimation is the first reading until the
+    first block is full, so it converges within a single block.
+
+    Attributes:
+        block_size      Number of readings per block, 100 is one second at the default sampling rate
+        block_count     Number of block medians the estimation is the median of
+    """
+    block_size: int = 100
+    block_count: int = 31
+
+    __block: [float]
+    __block_medians: deque
+    __current_estimation: Optional[float] = None
+
+    def __init__(self, block_size: int = 100, block_count: int = 31):
+        self.block_size = block_size
+        self.block_count = block_count
+        self.__block = []
+        self.__block_medians = deque(maxlen=block_count)
+
+    def update(self, reading: float):
+        if self.__current_estimation is None:
+            self.__current_estimation = reading
+
+        self.__block.append(reading)
+        if len(self.__block) >= self.block_size:
+            self.__block_medians.append(statistics.median(self.__block))
+            self.__block.clear()
+            self.__current_estimation = statistics.median(self.__block_medians)
+
+    def get_ambient_pressure_estimation(self) -> float:
+        return self.__current_estimation
+
+    def update_batch(self, readings):
+        import numpy as np
+
+        readings = np.asarray(readings, dtype=np.float64)
+        if len(readings) == 0:
+            return np.empty(0, dtype=np.float64)
+        if self.__current_estimation is None:
+            self.__current_estimation = float(readings[0])
+
+        # Complete the pending block with the new readings and reduce all full blocks at once
+        pending = len(self.__block)
+        data = np.concatenate([np.asarray(self.__block, dtype=np.float64), readings])
+        full_blocks = len(data) // self.block_size
+        new_medians = np.median(data[:full_blocks * self.block_size].reshape(-1, self.block_size), axis=1)
+
+        # Median over the last block_count block medians after each new block. The first windows may still be
+        # shorter than block_count, the remaining ones are computed at once over a sliding window view.
+        medians = np.concatenate([np.asarray(self.__block_medians, dtype=np.float64), new_medians])
+        old_count = len(self.__block_medians)
+        block_estimations = np.empty(full_blocks, dtype=np.float64)
+        first_full = min(full_blocks, max(0, self.block_count - old_count - 1))
+        for i in range(first_full):
+            block_estimations[i] = np.median(medians[:old_count + i + 1])
+        if first_full < full_blocks:
+            # sliding_window_view would do the same, but it needs NumPy 1.20
+            stride = medians.strides[0]
+            windows = np.lib.stride_tricks.as_strided(medians, (len(medians) - self.block_count + 1, self.block_count),
+                                                      (stride, stride), writeable=False)
+            block_estimations[first_full:] = np.median(windows[old_count + first_full + 1 - self.block_count:],
+                                                       axis=1)
+
+        # Each reading sees the estimation of the last block completed up to and including it
+        completed = (np.arange(len(readings)) + pending + 1) // self.block_size
+        estimations = np.where(completed > 0, block_estimations[np.maximum(completed, 1) - 1]
+                               if full_blocks else 0.0, self.__current_estimation)
+
+        # Carry the state over, so per reading and batch updates can be mixed
+        self.__block_medians.extend(new_medians.tolist())
+        self.__block = data[full_blocks * self.block_size:].tolist()
+        if full_blocks:
+            self.__current_estimation = float(block_estimations[-1])
+        return estimations
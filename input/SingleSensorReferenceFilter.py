@@ -1,4 +1,7 @@
-class SingleSensorReferenceFilter:
+from input.IAmbientPressureEstimator import IAmbientPressureEstimator
+
+
+class SingleSensorReferenceFilter(IAmbientPressureEstimator):
     """
     Filter that tries to detect ambient pressure from a sensor that's also used for sipping and puffing.
 
@@ -25,6 +28,10 @@ class SingleSensorReferenceFilter:
     __observation_count_limit: int = 2_000
     __current_estimation: float = 97_500.0
 
+    def __init__(self):
+        self.__cur_observation_count = 0
+        self.__current_estimation = 97_500.0
+
     def initialize(self, reading):
         self.__current_estimation = reading
         self.__cur_observation_count += 100
@@ -63,3 +70,41 @@ class SingleSensorReferenceFilter:
     def get_ambient_pressure_estimation(self) -> float:
         """This should only called after at least one call to update with an actual sensor reading"""
         return self.__current_estimation
+
+    def update_batch(self, readings):
+        """
+        Same as calling update for each reading, with the state kept in local variables instead of attributes.
+        The weight of each reading depends on its distance to the estimation of the previous one, so the recursion
+        is nonlinear and can't be vectorized, but skipping the attribute accesses and calls still saves most of the
+        time per reading.
+        :param readings: Array-like of pressure readings in Pascal
+        :return: NumPy array of the estimations after each reading
+        """
+        import numpy as np
+
+        estimation = self.__current_estimation
+        count = self.__cur_observation_count
+        count_limit = self.__observation_count_limit
+        expected_variance = self.expectedVariance
+        estimations = []
+        append = estimations.append
+
+        for reading in np.asarray(readings, dtype=np.float64).tolist():
+            if count < 10:
+                estimation = reading
+                count += 100
+
+            diff = estimation - reading
+            attenuation_factor = abs(diff / expected_variance)
+            if attenuation_factor != 0:
+                weight = 1.0 / attenuation_factor
+                if weight > 10.0:
+                    weight = 10.0
+                estimation = (estimation * count + reading * weight) / (count + weight)
+                if count < count_limit:
+                    count += 1
+            append(estimation)
+
+        self.__current_estimation = estimation
+        self.__cur_observation_count = count
+        return np.array(estimations, dtype=np.float64)
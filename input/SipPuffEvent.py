@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
 from enum import Enum, auto
 
+from helpers.LatencyTracer import TracedMessage
+
 
 class SipPuffEvent(Enum):
     """
@@ -38,6 +40,21 @@ class SipPuffEvent(Enum):
         )
 
 
+class SipPuffMessage(TracedMessage):
+    """
+    A sip-puff event together with the name of the sensor that detected it.
+    This is what the input worker sends, since several sensors can be handled by it.
+    The trace records the time of the sensor reading that triggered the event and every hop after it.
+    """
+    event: SipPuffEvent
+    source: str
+
+    def __init__(self, event: SipPuffEvent, source: str):
+        super().__init__()
+        self.event = event
+        self.source = source
+
+
 class SipPuffListener(ABC):
     """ Interface for something receiving sip/puff events """
 
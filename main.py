@@ -1,51 +1,122 @@
-from AudioPlayer import AudioPlayer
+import signal
+from functools import partial
+
+from helpers.BootTimeline import BootTimeline, BootPhase
 from InputWorker import InputWorker
-from MusicDB import MusicDB
-from ScannerWorker import ScannerWorker
-from input.SipPuffEvent import SipPuffEvent
-from helpers.QueueMerge import QueueMerge
-from scanner.ScannerEvents import ScannerEvent, RootPathAppeared, RootPathRemoved, AudioFileFound
 
 if __name__ == '__main__':
-    # Create the database
-    mdb = MusicDB()
+    # The phases of the startup, printed once sip-puff input works and there's something to play
+    timeline = BootTimeline()
+    timeline.mark("input_imported")
 
-    # initialize input system
+    # initialize input system first, the sensor is set up in the worker while the rest of the startup goes on
     inputProcess = InputWorker()
     inputProcess.start()
+    timeline.mark("input_worker_spawned")
+
+    # Imported after forking the input worker, which has no use for them
+    from AudioPlayer import AudioPlayer
+    from MusicDB import MusicDB
+    from ShuffleBag import ShuffleBag
+    from ScannerWorker import ScannerWorker
+    from input.SipPuffEvent import SipPuffEvent, SipPuffMessage
+    from helpers.EventRuntime import EventRuntime
+    from helpers.LatencyTracer import LatencyTracer
+    from scanner.ScannerEvents import ScannerEvent, RootPathAppeared, RootPathRemoved, AudioFileFound, \
+        AudioFilesFound, AudioFileGainUpdated, AudioFileGainsUpdated
+    timeline.mark("imported")
+
+    # Create the database, the playback order takes care of adding to it
+    mdb = MusicDB()
+    playback_order = ShuffleBag(mdb)
 
     # initialize scanner
     scannerProcess = ScannerWorker()
     scannerProcess.start()
+    timeline.mark("scanner_worker_spawned")
 
-    # merge the outputs into a single queue
-    qm = QueueMerge()
-    qm.add_input_queue(inputProcess.output_queue)
-    qm.add_input_queue(scannerProcess.output_queue)
-
-    # initialize audio player
+    # initialize audio player, which loads VLC
     player = AudioPlayer()
+    timeline.mark("player_ready")
+
+    # Latencies from sensor reading to sound, printed together with the timeline when receiving SIGUSR1
+    tracer = LatencyTracer()
+
+    def boot_phase_reached(phase: BootPhase):
+        if timeline.add(phase) and "first_sample" in timeline and "first_playable_track" in timeline:
+            print("Startup finished:")
+            timeline.dump()
+
+    # The track that plays on the next puff, prepared by the player ahead of time
+    next_music = None
+
+    def prepare_next_music(delay: float = 0.0):
+        global next_music
+        next_music = playback_order.get_next_entry()
+        if next_music is not None:
+            player.prepare(next_music.path, delay)
+            boot_phase_reached(BootPhase("first_playable_track"))
+
+    def record_playing(traced: SipPuffMessage):
+        traced.stamp("playing")
+        tracer.record(traced)
+
+    async def handle_scanner_event(event: ScannerEvent):
+        if isinstance(event, RootPathAppeared):
+            playback_order.add_root_path(event.rootPath)
+        elif isinstance(event, RootPathRemoved):
+            playback_order.remove_root_path(event.rootPath)
+            if next_music is not None and event.rootPath.absolute() in next_music.path.absolute().parents:
+                player.drop_prepared(event.rootPath)
+                prepare_next_music()
+        elif isinstance(event, AudioFileFound):
+            playback_order.add_entry(event.path, event.gain_level)
+            print(event.path.__str__() + ": " + event.gain_level.__str__())
+            if next_music is None:
+                prepare_next_music()
+        elif isinstance(event, AudioFilesFound):
+            for path, gain_level in event:
+                playback_order.add_entry(path, gain_level)
+            print("Added " + len(event).__str__() + " files")
+            if next_music is None:
+                prepare_next_music()
+        elif isinstance(event, AudioFileGainUpdated):
+            mdb.update_gain_level(event.path, event.gain_level)
+        elif isinstance(event, AudioFileGainsUpdated):
+            for path, gain_level in event:
+                mdb.update_gain_level(path, gain_level)
+
+    async def handle_boot_phase(phase: BootPhase):
+        boot_phase_reached(phase)
+
+    async def handle_sip_puff_message(message: SipPuffMessage):
+        # All sensors control the same player
+        message.stamp("dispatched")
+        event = message.event
+        if event in SipPuffEvent.get_all_puff_events():
+            music = next_music if next_music is not None else playback_order.get_next_entry()
+            if music:
+                # The gain level may have been updated since the track was prepared
+                gain_level = mdb.get_gain_level(music.path)
+                message.stamp("play_called")
+                player.play(music.path, gain_level if gain_level is not None else music.gain_level,
+                            on_playing=partial(record_playing, message))
+                # Leaves the drive to the starting track for a moment
+                prepare_next_music(delay=2.0)
+                return
+        elif event in SipPuffEvent.get_all_sip_events():
+            player.stop()
+            message.stamp("stopped")
+        tracer.record(message)
 
-    while True:
-        # Endless work loop. We read an event and act on it
-        event = qm.outputQueue.get()
-        # print(event.__str__())
-
-        if isinstance(event, ScannerEvent):
-            # Scanner event handler block
-            if isinstance(event, RootPathAppeared):
-                mdb.add_root_path(event.rootPath)
-            elif isinstance(event, RootPathRemoved):
-                mdb.remove_root_path(event.rootPath)
-            elif isinstance(event, AudioFileFound):
-                mdb.add_entry(event.path, event.gain_level)
-                print(event.path.__str__() + ": " + event.gain_level.__str__())
-
-        elif isinstance(event, SipPuffEvent):
-            # Input event handler block
-            if event in SipPuffEvent.get_all_puff_events():
-                music = (mdb.get_random_entry())
-                if music:
-                    player.play(music.path, music.gain_level)
-            elif event in SipPuffEvent.get_all_sip_events():
-                player.stop()
+    # The runtime waits on the workers' pipes and dispatches their events to the handlers
+    runtime = EventRuntime()
+    runtime.add_connection(inputProcess.connection)
+    runtime.add_connection(scannerProcess.connection)
+    runtime.add_handler(ScannerEvent, handle_scanner_event)
+    runtime.add_handler(SipPuffMessage, handle_sip_puff_message)
+    runtime.add_handler(BootPhase, handle_boot_phase)
+    # Dumped from within the loop, a plain signal handler could interrupt a record or mark holding their lock
+    runtime.add_signal_handler(signal.SIGUSR1, timeline.dump)
+    runtime.add_signal_handler(signal.SIGUSR1, tracer.dump)
+    runtime.run()
@@ -1,7 +1,36 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from scanner.PreScanner import Prescanner
 
 if __name__ == '__main__':
-    prescanner = Prescanner()
-    prescanner.scan_root_path(Path("/mnt/e"), Path("/mnt/e/gain_database.json"))
+    parser = argparse.ArgumentParser(description="Writes a gain database to the root of each given drive")
+    parser.add_argument("paths", nargs="*", type=Path, default=[Path("/mnt/e")],
+                        help="Root paths of the drives to scan")
+    parser.add_argument("--workers", type=int, default=None, help="Number of files analyzed in parallel")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Extend existing gain databases instead of refusing to overwrite them")
+    parser.add_argument("--no-fingerprints", action="store_true", help="Don't write fingerprint keys")
+    parser.add_argument("--no-sha1", action="store_true", help="Don't write SHA1 keys")
+    parser.add_argument("--no-index", action="store_true", help="Don't write a binary gain index")
+    args = parser.parse_args()
+
+    prescanner = Prescanner(args.workers, write_fingerprints=not args.no_fingerprints, write_sha1=not args.no_sha1,
+                            write_index=not args.no_index)
+
+    # All drives are scanned at the same time and share the prescanner's workers
+    with ThreadPoolExecutor(max_workers=len(args.paths)) as executor:
+        scans = [(path, executor.submit(prescanner.scan_root_path, path, path / "gain_database.json",
+                                        args.incremental)) for path in args.paths]
+        try:
+            for path, scan in scans:
+                try:
+                    scan.result()
+                except Exception as e:
+                    print("Error scanning " + path.__str__() + ": " + e.__str__())
+        except KeyboardInterrupt:
+            print("Cancelling, waiting for the files being analyzed")
+            prescanner.cancel()
+
+    prescanner.shutdown()
@@ -0,0 +1,132 @@
+import os
+import signal
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from threading import Event, Lock
+from typing import Callable, Iterable, Iterator, Optional
+
+
+def _ignore_interrupts():
+    # Ctrl+C is handled by the main process, which cancels the analysis and waits for the running files
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class AnalysisPool:
+    """
+    Runs the analysis of files, i.e. hashing and loudness calculation, on several cores.
+
+    The number of files in flight is bounded, so walking a drive with 100k files doesn't queue 100k jobs up front,
+    and a cancellation takes effect after the files currently being analyzed.
+
+    By default the pool uses threads. The expensive part of the loudness calculation runs in ffmpeg processes that
+    r128gain starts and hashlib releases the GIL while hashing, so threads already keep all cores busy. They also
+    work inside the daemonic worker processes, which aren't allowed to start a process pool.
+
+    Attributes:
+        worker_count    Number of files analyzed in parallel
+        ordered         Whether results are returned in the order of the files or as soon as they are ready
+    """
+    worker_count: int
+    ordered: bool
+
+    __use_processes: bool
+    __executor: Optional[Executor] = None
+    __cancelled: Event
+    __lock: Lock
+
+    def __init__(self, worker_count: Optional[int] = None, ordered: bool = False, use_processes: bool = False):
+        self.worker_count = worker_count if worker_count else (os.cpu_count() or 1)
+        self.ordered = ordered
+        self.__use_processes = use_processes
+        self.__cancelled = Event()
+        self.__lock = Lock()
+
+    def __get_executor(self) -> Executor:
+        # Created on first use, so the threads belong to the process that actually runs the analysis.
+        # Several threads may map on the same pool, e.g. one per drive.
+        with self.__lock:
+            if self.__executor is None:
+                if self.__use_processes:
+                    self.__executor = ProcessPoolExecutor(max_workers=self.worker_count,
+                                                          initializer=_ignore_interrupts)
+                else:
+                    self.__executor = ThreadPoolExecutor(max_workers=self.worker_count,
+                                                         thread_name_prefix="analysis")
+            return self.__executor
+
+    def map(self, function: Callable, items: Iterable, cancelled: Optional[Event] = None) -> Iterator[tuple]:
+        """
+        Applies a function to all items in parallel. Several maps can run on the same pool from different threads,
+        they share its workers.
+        With processes, the function has to be picklable, i.e. a module level function.
+        :param function: The function to apply to each item
+        :param items: The items, which are consumed lazily
+        :param cancelled: Stops this map once it is set, in addition to the cancellation of the whole pool
+        :return: Iterator over tuples of item and result. Exceptions raised by the function are returned as result.
+        """
+        if cancelled is None:
+            cancelled = self.__cancelled
+        executor = self.__get_executor()
+        max_in_flight = 2 * self.worker_count
+        in_flight: deque = deque()
+        item_iterator = iter(items)
+        exhausted = False
+
+        try:
+            while True:
+                # Keep the pool busy, but don't queue more than necessary
+                while not exhausted and len(in_flight) < max_in_flight and not self.__is_cancelled(cancelled):
+                    try:
+                        item = next(item_iterator)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    in_flight.append((item, executor.submit(function, item)))
+
+                if not in_flight or self.__is_cancelled(cancelled):
+                    return
+
+                if self.ordered:
+                    item, future = in_flight.popleft()
+                    yield item, self.__get_result(future)
+                else:
+                    # Wait for whichever finishes first
+                    done = self.__wait_first(in_flight)
+                    in_flight.remove(done)
+                    yield done[0], self.__get_result(done[1])
+        finally:
+            for _, future in in_flight:
+                future.cancel()
+
+    @staticmethod
+    def __wait_first(in_flight: deque) -> (object, Future):
+        done, _ = wait([future for _, future in in_flight], return_when=FIRST_COMPLETED)
+        for entry in in_flight:
+            if entry[1] in done:
+                return entry
+
+    @staticmethod
+    def __get_result(future: Future):
+        try:
+            return future.result()
+        except Exception as e:
+            return e
+
+    def __is_cancelled(self, cancelled: Event) -> bool:
+        return cancelled.is_set() or self.__cancelled.is_set()
+
+    def cancel(self):
+        """
+        Stops all running and future maps after the files currently being analyzed. Safe to call from other threads.
+        Use the cancellation event of map to stop a single map.
+        :return: None
+        """
+        self.__cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self.__cancelled.is_set()
+
+    def shutdown(self):
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+            self.__executor = None
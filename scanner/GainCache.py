@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import sys
+from pathlib import Path
+from threading import Lock
+from typing import Optional
+
+
+def get_filesystem_uuid(path) -> Optional[str]:
+    """
+    Finds the UUID of the filesystem a path is on by matching its device against the links in /dev/disk/by-uuid.
+    Unlike the device name or the mount point, the UUID stays the same when a drive is plugged into another port.
+    :param path: Any path on the filesystem
+    :return: The filesystem's UUID or None, if it couldn't be determined
+    """
+    uuid_directory = "/dev/disk/by-uuid"
+    try:
+        device = os.stat(path).st_dev
+        for uuid in os.listdir(uuid_directory):
+            try:
+                if os.stat(os.path.join(uuid_directory, uuid)).st_rdev == device:
+                    return uuid
+            except OSError:
+                continue
+    except:
+        pass
+    return None
+
+
+class GainCacheEntry:
+    """The cached analysis result of a single file"""
+    size: int
+    mtime_ns: int
+    hash: str
+    gain: float
+
+    def __init__(self, size: int, mtime_ns: int, hash: str, gain: float):
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.hash = hash
+        self.gain = gain
+
+    def matches(self, stat_result: os.stat_result) -> bool:
+        """
+        :param stat_result: The current stat of the file
+        :return: Whether the file is still the one that was analyzed
+        """
+        return self.size == stat_result.st_size and self.mtime_ns == stat_result.st_mtime_ns
+
+
+class GainCache:
+    """
+    Persistent cache of hashes and gain levels of the files on known drives.
+
+    Files are identified by the UUID of their filesystem, their path relative to the root path, their size and their
+    modification time. A file that's still in the cache is thus available without reading a single byte of it.
+
+    The cache lives in an SQLite database on the SD card. It's written in WAL mode, so a hard power off loses at most
+    the last few entries but never corrupts the database. Since it's just a cache, a database that can't be opened
+    is deleted and started over.
+
+    The connection is opened on first use, so the cache can be created before a worker process starts and is used
+    from within the worker only. Within the worker it can be used from several threads, e.g. one per scanned drive.
+    """
+    default_path: Path = Path.home() / ".cache" / "sip-puff-jukebox" / "gain_cache.sqlite"
+
+    # Number of entries written per transaction
+    commit_interval: int = 200
+
+    __path: Path
+    __connection: Optional[sqlite3.Connection] = None
+    __pending: int = 0
+    __lock: Lock
+
+    def __init__(self, path: Optional[Path] = None):
+        self.__path = path if path is not None else self.default_path
+        self.__lock = Lock()
+
+    def __get_connection(self) -> sqlite3.Connection:
+        if self.__connection is None:
+            try:
+                self.__connection = self.__open()
+            except sqlite3.DatabaseError as e:
+                sys.stderr.write("Gain cache " + self.__path.__str__() + " is broken, starting over: " +
+                                 e.__str__() + "\n")
+                for suffix in ["", "-wal", "-shm"]:
+                    try:
+                        os.remove(self.__path.__str__() + suffix)
+                    except OSError:
+                        pass
+                self.__connection = self.__open()
+        return self.__connection
+
+    def __open(self) -> sqlite3.Connection:
+        self.__path.parent.mkdir(parents=True, exist_ok=True)
+        # Access from several threads is serialized by the lock
+        connection = sqlite3.connect(self.__path.__str__(), check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS gain_cache ("
+                           "filesystem_uuid TEXT NOT NULL, "
+                           "relative_path TEXT NOT NULL, "
+                           "size INTEGER NOT NULL, "
+                           "mtime_ns INTEGER NOT NULL, "
+                           "hash TEXT NOT NULL, "
+                           "gain REAL NOT NULL, "
+                           "PRIMARY KEY (filesystem_uuid, relative_path))")
+        connection.commit()
+        return connection
+
+    def load(self, filesystem_uuid: str) -> {str: GainCacheEntry}:
+        """
+        Loads all entries of a filesystem at once, which is a lot faster than querying file by file
+        :param filesystem_uuid: The UUID of the filesystem
+        :return: The entries by relative path
+        """
+        try:
+            with self.__lock:
+                rows = self.__get_connection().execute(
+                    "SELECT relative_path, size, mtime_ns, hash, gain FROM gain_cache WHERE filesystem_uuid = ?",
+                    (filesystem_uuid,)).fetchall()
+            return {row[0]: GainCacheEntry(row[1], row[2], row[3], row[4]) for row in rows}
+        except:
+            sys.stderr.write("Error loading the gain cache for " + filesystem_uuid + "\n")
+            return {}
+
+    def store(self, filesystem_uuid: str, relative_path: str, entry: GainCacheEntry):
+        """
+        Adds or replaces the entry of a file. Entries are committed in batches, call commit when done.
+        :param filesystem_uuid: The UUID of the file's filesystem
+        :param relative_path: The file's path relative to the root path
+        :param entry: The analysis result
+        :return: None
+        """
+        try:
+            with self.__lock:
+                self.__get_connection().execute(
+                    "INSERT OR REPLACE INTO gain_cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (filesystem_uuid, relative_path, entry.size, entry.mtime_ns, entry.hash, entry.gain))
+                self.__pending += 1
+                if self.__pending >= self.commit_interval:
+                    self.__commit_locked()
+        except:
+            sys.stderr.write("Error writing the gain cache entry for " + relative_path + "\n")
+
+    def commit(self):
+        with self.__lock:
+            self.__commit_locked()
+
+    def __commit_locked(self):
+        if self.__connection is not None and self.__pending:
+            try:
+                self.__connection.commit()
+            except:
+                sys.stderr.write("Error committing the gain cache\n")
+            self.__pending = 0
+
+    def close(self):
+        with self.__lock:
+            if self.__connection is not None:
+                self.__commit_locked()
+                self.__connection.close()
+                self.__connection = None
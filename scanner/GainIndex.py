@@ -0,0 +1,218 @@
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Optional, Iterator
+
+from scanner.Scan import fingerprint_prefix, is_fingerprint
+
+
+class GainIndex:
+    """
+    Binary form of a gain database that can be searched without parsing it.
+
+    The file starts with a header of magic, format version and the number of entries per key kind. It's followed by
+    one section per key kind, SHA1 hashes first and fingerprints second. Each section consists of the sorted binary
+    keys and the gain levels as 32 bit floats in the same order. SHA1 hashes are stored as their 20 byte digests,
+    fingerprints as 8 byte big endian file size followed by the 16 byte digest. All values are little endian.
+
+    Lookups are binary searches on the file's buffer, so opening an index takes constant time no matter how many
+    entries it has. The searches run in NumPy on a fixed width bytes view of the key sections, which makes a lookup
+    about as fast as in a dict. It supports the parts of the dict interface the scanner uses for gain databases.
+    """
+    file_name: str = "gain_index.bin"
+
+    # Format version 1 stores fingerprints of the "fp1:" kind, a new fingerprint kind needs a new version
+    magic: bytes = b"SPGI"
+    version: int = 1
+    header_format: str = "<4sHHII"
+    hash_width: int = 20
+    fingerprint_width: int = 24
+
+    __buffer = None
+    __hashes = None  # NumPy arrays of the keys and gain levels in the file's buffer
+    __hash_gains = None
+    __fingerprints = None
+    __fingerprint_gains = None
+
+    def __init__(self, buffer):
+        """
+        :param buffer: The content of an index file, e.g. bytes or an mmap
+        """
+        header_size = struct.calcsize(self.header_format)
+        if len(buffer) < header_size:
+            raise Exception("Gain index too short")
+        magic, version, _, hash_count, fingerprint_count = struct.unpack_from(self.header_format, buffer)
+        if magic != self.magic or version != self.version:
+            raise Exception("Unsupported gain index version " + version.__str__())
+        expected_size = header_size + hash_count * (self.hash_width + 4) + \
+            fingerprint_count * (self.fingerprint_width + 4)
+        if len(buffer) != expected_size:
+            raise Exception("Gain index has " + len(buffer).__str__() + " bytes instead of " +
+                            expected_size.__str__())
+
+        # NumPy is only needed by the processes that scan, so it's imported here
+        import numpy as np
+
+        self.__buffer = buffer
+        offset = header_size
+        # Views without copying. The keys of a section have the same width, so the trailing null bytes that NumPy
+        # ignores for bytes strings don't change their order.
+        self.__hashes = np.frombuffer(buffer, dtype="S" + self.hash_width.__str__(), count=hash_count,
+                                      offset=offset)
+        offset += hash_count * self.hash_width
+        self.__hash_gains = np.frombuffer(buffer, dtype="<f4", count=hash_count, offset=offset)
+        offset += hash_count * 4
+        self.__fingerprints = np.frombuffer(buffer, dtype="S" + self.fingerprint_width.__str__(),
+                                            count=fingerprint_count, offset=offset)
+        offset += fingerprint_count * self.fingerprint_width
+        self.__fingerprint_gains = np.frombuffer(buffer, dtype="<f4", count=fingerprint_count, offset=offset)
+
+    @staticmethod
+    def open(path: Path, memory_map: bool = True) -> 'GainIndex':
+        """
+        :param path: The index file
+        :param memory_map: Whether to map the file instead of reading it. Reading it is safer for files on
+                           removable drives, since accessing a mapping of a file whose drive is gone kills the process.
+        :return: The index
+        """
+        with open(path, 'rb') as file_handle:
+            if memory_map:
+                return GainIndex(mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ))
+            return GainIndex(file_handle.read())
+
+    def close(self):
+        if isinstance(self.__buffer, mmap.mmap):
+            # The views have to go before the mapping can be closed
+            self.__hashes = None
+            self.__hash_gains = None
+            self.__fingerprints = None
+            self.__fingerprint_gains = None
+            self.__buffer.close()
+
+    @classmethod
+    def encode_key(cls, key: str) -> Optional[bytes]:
+        """
+        :param key: A SHA1 hash or a fingerprint as string
+        :return: The binary key or None if the key can't be stored in an index
+        """
+        try:
+            if is_fingerprint(key):
+                size, digest = key[len(fingerprint_prefix):].split(":")
+                binary = int(size).to_bytes(8, 'big') + bytes.fromhex(digest)
+                return binary if len(binary) == cls.fingerprint_width else None
+            binary = bytes.fromhex(key)
+            return binary if len(binary) == cls.hash_width else None
+        except:
+            return None
+
+    @classmethod
+    def decode_fingerprint(cls, binary: bytes) -> str:
+        return fingerprint_prefix + int.from_bytes(binary[:8], 'big').__str__() + ":" + binary[8:].hex()
+
+    def __get_section(self, key: str):
+        """:return: The keys and gain levels of the section the key belongs to"""
+        if is_fingerprint(key):
+            return self.__fingerprints, self.__fingerprint_gains
+        return self.__hashes, self.__hash_gains
+
+    def __find(self, key: str) -> Optional[int]:
+        """:return: The index of the key in its section or None if it's not in the index"""
+        binary = self.encode_key(key)
+        if binary is None:
+            return None
+        keys, _ = self.__get_section(key)
+        index = int(keys.searchsorted(binary))
+        # NumPy drops the trailing null bytes of the key it returns, which is the same for keys of the same width
+        if index < len(keys) and keys[index] == binary.rstrip(b"\0"):
+            return index
+        return None
+
+    def get(self, key: str, default: Optional[float] = None) -> Optional[float]:
+        index = self.__find(key)
+        if index is None:
+            return default
+        _, gains = self.__get_section(key)
+        return float(gains[index])
+
+    def get_many(self, keys: [Optional[str]]) -> [Optional[float]]:
+        """
+        Looks up many keys at once, which searches each section once for all of them instead of once per key
+        :param keys: The keys to look up, None for a file without a key
+        :return: The gain level of each key or None if it's not in the index
+        """
+        import numpy as np
+
+        levels = [None] * len(keys)
+        sections = {False: ([], []), True: ([], [])}
+        for position, key in enumerate(keys):
+            binary = self.encode_key(key) if key is not None else None
+            if binary is not None:
+                positions, binaries = sections[is_fingerprint(key)]
+                positions.append(position)
+                binaries.append(binary)
+        for fingerprints, (positions, binaries) in sections.items():
+            section_keys, section_gains = (self.__fingerprints, self.__fingerprint_gains) if fingerprints else \
+                (self.__hashes, self.__hash_gains)
+            if not binaries or len(section_keys) == 0:
+                continue
+            queries = np.array(binaries, dtype=section_keys.dtype)
+            indices = np.minimum(section_keys.searchsorted(queries), len(section_keys) - 1)
+            found = np.flatnonzero(section_keys[indices] == queries)
+            for position, level in zip(np.array(positions)[found].tolist(), section_gains[indices[found]].tolist()):
+                levels[position] = level
+        return levels
+
+    def __contains__(self, key: str) -> bool:
+        return self.__find(key) is not None
+
+    def __getitem__(self, key: str) -> float:
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __len__(self) -> int:
+        return len(self.__hashes) + len(self.__fingerprints)
+
+    def __iter__(self) -> Iterator[str]:
+        for binary in self.__hashes.tolist():
+            yield binary.ljust(self.hash_width, b"\0").hex()
+        for binary in self.__fingerprints.tolist():
+            yield self.decode_fingerprint(binary.ljust(self.fingerprint_width, b"\0"))
+
+    def get_hash_count(self) -> int:
+        return len(self.__hashes)
+
+    def get_fingerprint_count(self) -> int:
+        return len(self.__fingerprints)
+
+    @classmethod
+    def write(cls, data: {str: float}, path: Path):
+        """
+        Writes a gain database as index, atomically replacing an existing one.
+        Keys that can't be stored in an index are left out.
+        :param data: The gain levels by key
+        :param path: The index file
+        :return: None
+        """
+        hashes = []
+        fingerprints = []
+        for key, gain in data.items():
+            binary = cls.encode_key(key)
+            if binary is None:
+                continue
+            (fingerprints if is_fingerprint(key) else hashes).append((binary, gain))
+        hashes.sort()
+        fingerprints.sort()
+
+        temporary_path = path.with_name(path.name + ".tmp")
+        with open(temporary_path, 'wb') as file_handle:
+            file_handle.write(struct.pack(cls.header_format, cls.magic, cls.version, 0, len(hashes),
+                                          len(fingerprints)))
+            for section in [hashes, fingerprints]:
+                file_handle.write(b"".join(binary for binary, _ in section))
+                file_handle.write(struct.pack("<" + len(section).__str__() + "f", *(gain for _, gain in section)))
+            file_handle.flush()
+            os.fsync(file_handle.fileno())
+        os.replace(temporary_path, path)
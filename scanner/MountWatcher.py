@@ -0,0 +1,136 @@
+import fnmatch
+import os
+import select
+import sys
+import time
+from pathlib import Path, PurePosixPath
+from typing import Optional
+
+
+class MountWatcher:
+    """
+    Watches the mount table for mount points matching some patterns.
+
+    The kernel signals every change of the mount table by marking /proc/self/mountinfo with POLLPRI, so the watcher
+    sleeps until something is (un)mounted and notices a drive right away instead of within the next polling interval.
+    For files that don't support this, e.g. a fake mountinfo in a test or a system without procfs notifications, the
+    file is reread every poll_interval seconds instead.
+
+    Attributes:
+        mountinfo_path          The mountinfo file to watch
+        mount_point_patterns    Shell style patterns of the mount points to report. They're matched component by
+                                component, so a * never matches a /. The defaults match the mount points of
+                                usbmount and of udisks.
+        poll_interval           Maximum time between two reads of the mountinfo file
+    """
+    mountinfo_path: Path
+    mount_point_patterns: [str] = ["/media/usb*", "/media/*/*"]
+    poll_interval: float = 5.0
+
+    __known: {str}
+    __poll_handle = None
+    __poller: Optional[select.poll] = None
+
+    def __init__(self, mountinfo_path: Path = Path("/proc/self/mountinfo"), mount_point_patterns: Optional[list] = None,
+                 poll_interval: float = 5.0):
+        self.mountinfo_path = mountinfo_path
+        if mount_point_patterns is not None:
+            self.mount_point_patterns = mount_point_patterns
+        self.poll_interval = poll_interval
+        self.__known = set()
+
+        # Only procfs signals changes, a regular file would just always be readable
+        if self.mountinfo_path.__str__().startswith("/proc/"):
+            try:
+                self.__poll_handle = open(self.mountinfo_path, 'rb')
+                self.__poller = select.poll()
+                self.__poller.register(self.__poll_handle.fileno(), select.POLLPRI | select.POLLERR)
+            except:
+                sys.stderr.write("Can't watch " + self.mountinfo_path.__str__() + ", falling back to polling\n")
+                self.__poller = None
+
+    @staticmethod
+    def is_supported(mountinfo_path: Path = Path("/proc/self/mountinfo")) -> bool:
+        return os.path.exists(mountinfo_path)
+
+    @staticmethod
+    def __unescape(field: str) -> str:
+        # Spaces, tabs, newlines and backslashes in paths are written as octal escapes like \040
+        if "\\" not in field:
+            return field
+        return field.encode().decode('unicode_escape').encode('latin-1').decode(errors='surrogateescape')
+
+    def matches(self, mount_point: str) -> bool:
+        """
+        :param mount_point: An absolute mount point
+        :return: Whether the mount point matches one of the patterns with the same number of path components
+        """
+        parts = PurePosixPath(mount_point).parts
+        for pattern in self.mount_point_patterns:
+            pattern_parts = PurePosixPath(pattern).parts
+            if len(pattern_parts) == len(parts) and \
+                    all(fnmatch.fnmatchcase(part, pattern_part) for part, pattern_part in zip(parts, pattern_parts)):
+                return True
+        return False
+
+    def read_mount_points(self) -> {str}:
+        """
+        :return: The mount points in the mountinfo file that match the patterns. Mount points within another
+                 matching one are left out, since they're scanned as part of it.
+        """
+        mount_points = set()
+        with open(self.mountinfo_path, 'r') as file_handle:
+            for line in file_handle:
+                fields = line.split(" ")
+                if len(fields) < 5:
+                    continue
+                mount_point = self.__unescape(fields[4])
+                if self.matches(mount_point):
+                    mount_points.add(mount_point)
+        return {mount_point for mount_point in mount_points
+                if not any(parent.__str__() in mount_points for parent in PurePosixPath(mount_point).parents)}
+
+    def get_changes(self) -> ([Path], [Path]):
+        """
+        Compares the current mount table to the one of the last call. The first call reports everything that is
+        mounted already as appeared.
+        :return: Tuple of the mount points that appeared and of those that disappeared
+        """
+        try:
+            current = self.read_mount_points()
+        except:
+            sys.stderr.write("Error reading " + self.mountinfo_path.__str__() + "\n")
+            return [], []
+        appeared = sorted(current - self.__known)
+        removed = sorted(self.__known - current)
+        self.__known = current
+        return [Path(p) for p in appeared], [Path(p) for p in removed]
+
+    def wait_for_changes(self, timeout: Optional[float] = None) -> ([Path], [Path]):
+        """
+        Blocks until the mount table changes in a way that matters or the timeout is over.
+        :param timeout: Maximum time to wait in seconds, None to wait until there is a change
+        :return: Tuple of the mount points that appeared and of those that disappeared, both empty after a timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            appeared, removed = self.get_changes()
+            if appeared or removed:
+                return appeared, removed
+
+            wait = self.poll_interval
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return [], []
+            if self.__poller is not None:
+                # Wakes up early on any change of the mount table, e.g. also for unrelated mounts
+                self.__poller.poll(wait * 1000)
+            else:
+                time.sleep(wait)
+
+    def close(self):
+        if self.__poll_handle is not None:
+            self.__poll_handle.close()
+            self.__poll_handle = None
+            self.__poller = None
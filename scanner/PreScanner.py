@@ -1,13 +1,36 @@
 import os
 import sys
 import json
+import time
+from functools import partial
 from pathlib import Path
+from typing import Iterator, Optional
 
-from scanner.Scan import get_gain_level, get_sha1_hash
+from scanner.AnalysisPool import AnalysisPool
+from scanner.GainIndex import GainIndex
+from scanner.Scan import analyze_keyed_file, get_fingerprint, get_sha1_hash
 
 
 class Prescanner:
-    """Scanner for prescanning thumbdrives and retrieving a map of file hashes and gain levels"""
+    """
+    Scanner for prescanning thumbdrives and retrieving a map of file hashes and gain levels.
+    The files are analyzed in parallel, by default with one worker per core. Since the prescanner runs as a
+    standalone program, it can use a process pool. Several drives can be scanned at the same time from different
+    threads, they share the pool.
+
+    The gain database is written as checkpoint every checkpoint_interval seconds, and when the scan ends or is
+    cancelled. In incremental mode an existing gain database is loaded and only files whose keys aren't in it yet
+    are analyzed, so an interrupted scan continues where its last checkpoint left off.
+
+    Attributes:
+        write_fingerprints  Whether to key the files by their fingerprint, which the scanner can check without
+                            reading the whole file
+        write_sha1          Whether to key the files by their SHA1 hash, which older scanners understand
+        write_index         Whether to write a binary gain index next to the JSON gain database, which the scanner
+                            can search without parsing it
+        checkpoint_interval Seconds between writing the gain database while scanning
+        report_interval     Seconds between throughput reports
+    """
 
     audio_extensions: [str] = [
         ".mp3",
@@ -16,24 +39,140 @@ class Prescanner:
         ".wma",
     ]
 
-    def scan_root_path(self, scan_path: Path, output_path: Path):
-        data: {str: float} = {}
+    write_fingerprints: bool = True
+    write_sha1: bool = True
+    write_index: bool = True
+    checkpoint_interval: float = 60.0
+    report_interval: float = 10.0
+
+    __pool: AnalysisPool
+
+    def __init__(self, worker_count: Optional[int] = None, use_processes: bool = True,
+                 write_fingerprints: bool = True, write_sha1: bool = True, write_index: bool = True):
+        if not write_fingerprints and not write_sha1:
+            raise Exception("Prescanner needs at least one kind of key to write")
+        self.__pool = AnalysisPool(worker_count, ordered=False, use_processes=use_processes)
+        self.write_fingerprints = write_fingerprints
+        self.write_sha1 = write_sha1
+        self.write_index = write_index
+
+    def cancel(self):
+        """
+        Stops all running scans after the files currently being analyzed. Safe to call from other threads.
+        The scans still write what they've got so far.
+        :return: None
+        """
+        self.__pool.cancel()
+
+    def shutdown(self):
+        self.__pool.shutdown()
+
+    def __find_audio_files(self, scan_path: Path) -> Iterator[str]:
         for (dir_path, dirs, files) in os.walk(topdown=True, followlinks=False, top=scan_path):
             for file in files:
-                absolute_path = os.path.join(dir_path, file)
-
                 # Get the extension
                 ext = os.path.splitext(file)[-1].lower()
                 if ext in self.audio_extensions:
-                    gain = get_gain_level(absolute_path)
-                    hash = get_sha1_hash(absolute_path)
-                    if gain is not None and hash is not None:
-                        data[hash] = gain
-                        print("Added " + absolute_path.__str__() + " with gain " + gain.__str__())
-                    else:
-                        sys.stderr.write("Error scanning " + absolute_path.__str__() + "\n")
-
-        # Write hash table as a JSON file
-        json_dict = json.dumps(data)
-        with open(output_path, 'x') as file_handle:
-            file_handle.write(json_dict)
+                    yield os.path.join(dir_path, file)
+
+    def __write_database(self, data: {str: float}, output_path: Path):
+        """Replaces the gain database atomically, so an interruption leaves either the old or the new one"""
+        temporary_path = output_path.with_name(output_path.name + ".tmp")
+        with open(temporary_path, 'w') as file_handle:
+            file_handle.write(json.dumps(data))
+            file_handle.flush()
+            os.fsync(file_handle.fileno())
+        os.replace(temporary_path, output_path)
+
+        # The JSON database stays the reference, the index is derived from it. An index of an earlier prescan would
+        # be outdated now, the scanner ignores it but it's removed anyway.
+        index_path = output_path.with_name(GainIndex.file_name)
+        if self.write_index:
+            GainIndex.write(data, index_path)
+        else:
+            try:
+                os.remove(index_path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def __format_throughput(scan_path: Path, analyzed: int, skipped: int, analyzed_bytes: int,
+                            elapsed: float) -> str:
+        elapsed = max(elapsed, 1e-9)
+        return (scan_path.__str__() + ": " + analyzed.__str__() + " files analyzed, " + skipped.__str__() +
+                " already known, " + format(analyzed / elapsed, '.1f') + " files/s, " +
+                format(analyzed_bytes / elapsed / 1e6, '.1f') + " MB/s")
+
+    def scan_root_path(self, scan_path: Path, output_path: Path, incremental: bool = False):
+        """
+        Analyzes all audio files below a path and writes their gain levels into a gain database
+        :param scan_path: The path to scan, usually the root of a thumbdrive
+        :param output_path: The path of the gain database
+        :param incremental: Whether to extend an existing gain database. Otherwise the gain database must not exist.
+        :return: None
+        """
+        data: {str: float} = {}
+        if output_path.exists():
+            if not incremental:
+                raise Exception("Gain database " + output_path.__str__() + " already exists")
+            with open(output_path, 'r') as file_handle:
+                data = json.load(file_handle)
+            print("Loaded " + len(data).__str__() + " entries from " + output_path.__str__())
+
+        analyze = partial(analyze_keyed_file, use_fingerprint=self.write_fingerprints, use_sha1=self.write_sha1)
+        key_count = self.write_fingerprints + self.write_sha1
+        skipped = 0
+
+        def find_unknown_files() -> Iterator[tuple]:
+            # Known files are recognized by their first key, which is the cheap fingerprint if it's written at all.
+            # The keys are calculated in the pool as well, while the database stays in this process. The analysis
+            # gets the key along with the path, so it isn't calculated twice.
+            nonlocal skipped
+            get_key = get_fingerprint if self.write_fingerprints else get_sha1_hash
+            for path, key in self.__pool.map(get_key, self.__find_audio_files(scan_path)):
+                if not isinstance(key, str):
+                    yield path, None
+                elif key in data:
+                    skipped += 1
+                else:
+                    yield path, key
+
+        start = time.monotonic()
+        next_checkpoint = start + self.checkpoint_interval
+        next_report = start + self.report_interval
+        analyzed = 0
+        analyzed_bytes = 0
+
+        try:
+            for (absolute_path, _), result in self.__pool.map(analyze, find_unknown_files()):
+                if isinstance(result, Exception):
+                    sys.stderr.write("Error scanning " + absolute_path.__str__() + ": " + result.__str__() + "\n")
+                    continue
+
+                keys, gain = result
+                if gain is not None and len(keys) == key_count:
+                    for key in keys:
+                        data[key] = gain
+                    analyzed += 1
+                    try:
+                        analyzed_bytes += os.path.getsize(absolute_path)
+                    except OSError:
+                        pass
+                    print("Added " + absolute_path.__str__() + " with gain " + gain.__str__())
+                else:
+                    sys.stderr.write("Error scanning " + absolute_path.__str__() + "\n")
+
+                now = time.monotonic()
+                if now >= next_checkpoint:
+                    self.__write_database(data, output_path)
+                    next_checkpoint = now + self.checkpoint_interval
+                if now >= next_report:
+                    print(self.__format_throughput(scan_path, analyzed, skipped, analyzed_bytes, now - start))
+                    next_report = now + self.report_interval
+        finally:
+            # Also after a cancellation or an error, so the next incremental run doesn't redo the work
+            self.__write_database(data, output_path)
+            print(self.__format_throughput(scan_path, analyzed, skipped, analyzed_bytes, time.monotonic() - start))
+
+        if self.__pool.is_cancelled():
+            sys.stderr.write("Scan of " + scan_path.__str__() + " cancelled, wrote the files analyzed so far\n")
@@ -1,7 +1,9 @@
 import hashlib
+import os
 from typing import Optional
 
-import r128gain
+# mutagen and r128gain are imported where they're used. Importing them takes a while and only the processes that
+# actually analyze files need them, not every process that imports this module.
 
 
 def get_gain_level(filepath) -> Optional[float]:
@@ -11,6 +13,7 @@ def get_gain_level(filepath) -> Optional[float]:
     :return: Either the gain level for the file or None, if it couldn't be determined
     """
     try:
+        import r128gain
         gain_info = r128gain.get_r128_loudness([filepath])
         if isinstance(gain_info[0], float):
             return gain_info[0]
@@ -39,3 +42,145 @@ def get_sha1_hash(filepath) -> Optional[str]:
         return sha1.hexdigest()
     except:
         return None
+
+
+# Prefix of the fingerprint keys in gain databases. A different sampling scheme has to use a new version.
+fingerprint_prefix = "fp1:"
+fingerprint_block_size = 2 ** 15  # 32kB
+fingerprint_block_count = 8
+
+
+def is_fingerprint(key: str) -> bool:
+    return key.startswith(fingerprint_prefix)
+
+
+def get_fingerprint(filepath) -> Optional[str]:
+    """
+    Calculates a fingerprint of a file from its size and a few blocks spread evenly over it, including the first
+    and the last one. This reads only a fraction of a typical audio file, but still tells apart files that were
+    renamed and have different content, since those differ in size, in their tags at the start or end of the file
+    or in the audio data in between.
+    Small files are hashed completely.
+    :param filepath: The file to fingerprint
+    :return: The fingerprint as versioned string or None if some error occured
+    """
+    try:
+        with open(filepath, 'rb') as file_handle:
+            size = os.fstat(file_handle.fileno()).st_size
+            digest = hashlib.blake2b(size.to_bytes(8, 'little'), digest_size=16)
+            if size <= fingerprint_block_size * fingerprint_block_count:
+                digest.update(file_handle.read())
+            else:
+                last_offset = size - fingerprint_block_size
+                for i in range(fingerprint_block_count):
+                    file_handle.seek(last_offset * i // (fingerprint_block_count - 1))
+                    digest.update(file_handle.read(fingerprint_block_size))
+        return fingerprint_prefix + size.__str__() + ":" + digest.hexdigest()
+    except:
+        return None
+
+
+def analyze_file(filepath, gain_db: Optional[dict] = None, use_fingerprint: bool = False,
+                 use_sha1: bool = True, first_key: Optional[str] = None) -> ([str], Optional[float]):
+    """
+    Calculates the keys of a file and determines its gain level, unless the gain database already knows one of them.
+    The fingerprint is calculated first, since it is much cheaper, so the SHA1 hash is only calculated if the
+    fingerprint isn't known.
+    This is a module level function, so it can be run in a process pool.
+    :param filepath: The file to analyze
+    :param gain_db: Known gain levels by key
+    :param use_fingerprint: Whether to calculate the fingerprint
+    :param use_sha1: Whether to calculate the SHA1 hash
+    :param first_key: The first of the enabled keys, if it has been calculated already
+    :return: Tuple of the keys that could be calculated and the gain level, which is None if it couldn't be
+             determined
+    """
+    keys = []
+    get_keys = [get_key for enabled, get_key in [(use_fingerprint, get_fingerprint), (use_sha1, get_sha1_hash)]
+                if enabled]
+    for index, get_key in enumerate(get_keys):
+        key = first_key if index == 0 and first_key is not None else get_key(filepath)
+        if key is None:
+            continue
+        gain = gain_db.get(key) if gain_db is not None else None
+        if gain is not None:
+            return [key], gain
+        keys.append(key)
+    return keys, get_gain_level(filepath)
+
+
+def analyze_keyed_file(item: (str, Optional[str]), **kwargs) -> ([str], Optional[float]):
+    """
+    Same as analyze_file for a tuple of the file and its first key, which is what a pool passes to the function
+    :param item: Tuple of the file to analyze and its first key or None
+    :param kwargs: The other parameters of analyze_file
+    :return: See analyze_file
+    """
+    filepath, first_key = item
+    return analyze_file(filepath, first_key=first_key, **kwargs)
+
+
+# The loudness in LUFS that ReplayGain 2 and R128 gain tags are relative to
+replaygain_reference_loudness = -18.0
+r128_reference_loudness = -23.0
+
+
+def get_tagged_loudness(filepath) -> Optional[float]:
+    """
+    Reads the loudness of a file from its ReplayGain or R128 tags, which only needs the file's header.
+    Supports ID3 (MP3), Vorbis comments (FLAC, Ogg) and ASF attributes (WMA).
+    :param filepath: The file to read the tags of
+    :return: The loudness in the unit get_gain_level uses or None if the file has no such tags
+    """
+    try:
+        import mutagen
+        import mutagen.id3
+        audio = mutagen.File(filepath)
+        if audio is None or audio.tags is None:
+            return None
+
+        values: {str: str} = {}
+        if isinstance(audio.tags, mutagen.id3.ID3):
+            for frame in audio.tags.getall("TXXX"):
+                values[frame.desc.lower()] = frame.text[0].__str__()
+            for frame in audio.tags.getall("RVA2"):
+                if frame.desc.lower() == "track" and frame.channel == 1:
+                    values.setdefault("replaygain_track_gain", frame.gain.__str__())
+        else:
+            for key, value in audio.tags.items():
+                if isinstance(value, list):
+                    value = value[0]
+                values[key.lower()] = value.__str__()
+
+        if "r128_track_gain" in values:
+            # Q7.8 fixed point dB
+            return r128_reference_loudness - int(values["r128_track_gain"]) / 256.0
+        if "replaygain_track_gain" in values:
+            # Something like "-3.21 dB"
+            return replaygain_reference_loudness - float(values["replaygain_track_gain"].split()[0])
+    except:
+        pass
+    return None
+
+
+def resolve_known_gain(filepath, gain_db: Optional[dict] = None,
+                       use_fingerprint: bool = False) -> ([str], Optional[float], bool):
+    """
+    Determines the gain level of a file as far as possible without decoding it or reading it completely.
+    This is a module level function, so it can be run in a process pool.
+    :param filepath: The file to resolve
+    :param gain_db: Known gain levels by key
+    :param use_fingerprint: Whether to look up the file's fingerprint in the gain database
+    :return: Tuple of the calculated keys, the gain level and whether the gain level is final, i.e. from the gain
+             database. Otherwise it's the loudness from the file's tags, or None if it has none.
+    """
+    keys = []
+    if use_fingerprint:
+        key = get_fingerprint(filepath)
+        if key is not None:
+            keys.append(key)
+            # A single lookup, which matters for a GainIndex
+            gain = gain_db.get(key) if gain_db is not None else None
+            if gain is not None:
+                return keys, gain, True
+    return keys, get_tagged_loudness(filepath), False
@@ -0,0 +1,71 @@
+from threading import Lock, Timer
+from typing import Optional
+
+from scanner.ScannerEvents import ScannerEventHandler, ScannerEvent, AudioFileFound, AudioFilesFound, \
+    AudioFileGainUpdated, AudioFileGainsUpdated
+
+
+class ScannerEventBatcher(ScannerEventHandler):
+    """
+    Collects AudioFileFound events into AudioFilesFound batches and AudioFileGainUpdated events into
+    AudioFileGainsUpdated batches before passing them on to another handler.
+
+    The batches are passed on once one of them is full or once their oldest file has waited for max_delay seconds, so
+    files still become available quickly while a drive is scanned slowly. The found files are always passed on
+    before the gain updates, so an update never arrives before the file it's about. All other events are passed on
+    right away, after flushing the pending batches to keep the order of events.
+
+    Attributes:
+        max_batch_size  Number of files after which a batch is passed on
+        max_delay       Time in seconds after which a batch is passed on even if it isn't full
+    """
+    max_batch_size: int = 1000
+    max_delay: float = 0.5
+
+    __event_handler: ScannerEventHandler
+    __pending: [(str, float)]
+    __pending_updates: [(str, float)]
+    __lock: Lock
+    __timer: Optional[Timer] = None
+
+    def __init__(self, event_handler: ScannerEventHandler, max_batch_size: int = 1000, max_delay: float = 0.5):
+        self.__event_handler = event_handler
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self.__pending = []
+        self.__pending_updates = []
+        self.__lock = Lock()
+
+    def handle_scanner_event(self, event: ScannerEvent):
+        with self.__lock:
+            if isinstance(event, (AudioFileFound, AudioFileGainUpdated)):
+                pending = self.__pending if isinstance(event, AudioFileFound) else self.__pending_updates
+                pending.append((event.path, event.gain_level))
+                if len(pending) >= self.max_batch_size:
+                    self.__flush_locked()
+                elif self.__timer is None:
+                    # The timer flushes from its own thread, hence the lock
+                    self.__timer = Timer(self.max_delay, self.flush)
+                    self.__timer.daemon = True
+                    self.__timer.start()
+            else:
+                self.__flush_locked()
+                self.__event_handler.handle_scanner_event(event)
+
+    def flush(self):
+        """Passes on the pending files and gain updates, if any"""
+        with self.__lock:
+            self.__flush_locked()
+
+    def __flush_locked(self):
+        if self.__timer is not None:
+            self.__timer.cancel()
+            self.__timer = None
+        if self.__pending:
+            batch = AudioFilesFound(self.__pending)
+            self.__pending = []
+            self.__event_handler.handle_scanner_event(batch)
+        if self.__pending_updates:
+            batch = AudioFileGainsUpdated(self.__pending_updates)
+            self.__pending_updates = []
+            self.__event_handler.handle_scanner_event(batch)
@@ -1,4 +1,5 @@
-from scanner.ScannerEvents import ScannerEventHandler, ScannerEvent, RootPathRemoved, AudioFileFound, RootPathAppeared
+from scanner.ScannerEvents import ScannerEventHandler, ScannerEvent, RootPathRemoved, AudioFileFound, \
+    RootPathAppeared, AudioFilesFound, AudioFileGainUpdated, AudioFileGainsUpdated
 
 
 class ScannerEventPrinter(ScannerEventHandler):
@@ -9,4 +10,12 @@ class ScannerEventPrinter(ScannerEventHandler):
         if isinstance(event, RootPathAppeared):
             print("Root path was connected: " + event.rootPath.__str__())
         if isinstance(event, AudioFileFound):
-            print("Found audio file: " + event.path.__str__() + " with gain: " + event.gain_level.__str__())
\ No newline at end of file
+            print("Found audio file: " + event.path.__str__() + " with gain: " + event.gain_level.__str__())
+        if isinstance(event, AudioFilesFound):
+            for path, gain_level in event:
+                print("Found audio file: " + path.__str__() + " with gain: " + gain_level.__str__())
+        if isinstance(event, AudioFileGainUpdated):
+            print("Updated audio file: " + event.path.__str__() + " with gain: " + event.gain_level.__str__())
+        if isinstance(event, AudioFileGainsUpdated):
+            for path, gain_level in event:
+                print("Updated audio file: " + path.__str__() + " with gain: " + gain_level.__str__())
@@ -1,6 +1,9 @@
 """ Contains the events the Scanner produces """
+import os
 from abc import ABC, abstractmethod
+from array import array
 from pathlib import Path
+from typing import Iterator
 
 
 class ScannerEvent:
@@ -40,6 +43,7 @@ class AudioFileFound(ScannerEvent):
     """
     This event gets fired after an audio file has been processed and all necessary information for playback have been
     collected. This is currently only the gain level for correcting the perceived volume.
+    The gain level may be provisional, in which case an AudioFileGainUpdated follows once the file is analyzed.
     """
     path: Path
     gain_level: float
@@ -47,3 +51,50 @@ class AudioFileFound(ScannerEvent):
     def __init__(self, path: Path, gain_level: float):
         self.path = path
         self.gain_level = gain_level
+
+
+class AudioFileGainUpdated(ScannerEvent):
+    """
+    This event gets fired when the analysis of a file that was found with a provisional gain level is done.
+    The file's gain level should be replaced by this one.
+    """
+    path: Path
+    gain_level: float
+
+    def __init__(self, path: Path, gain_level: float):
+        self.path = path
+        self.gain_level = gain_level
+
+
+class AudioFileBatch(ScannerEvent):
+    """
+    Base class for batches of per file events in a compact encoding, to cut down on pickling and IPC for drives with
+    many files. The paths are stored as a single blob of null separated, file system encoded bytes, the gain levels
+    as an array of 32 bit floats.
+    """
+    paths: bytes
+    gain_levels: bytes
+
+    def __init__(self, entries: [(Path, float)]):
+        self.paths = b"\0".join(os.fsencode(path) for path, _ in entries)
+        self.gain_levels = array('f', (gain_level for _, gain_level in entries)).tobytes()
+
+    def __len__(self) -> int:
+        return len(self.gain_levels) // array('f').itemsize
+
+    def __iter__(self) -> Iterator[tuple]:
+        """Yields the path and gain level of every file in the batch"""
+        if not self.gain_levels:
+            return
+        gain_levels = array('f')
+        gain_levels.frombytes(self.gain_levels)
+        for path, gain_level in zip(self.paths.split(b"\0"), gain_levels):
+            yield Path(os.fsdecode(path)), gain_level
+
+
+class AudioFilesFound(AudioFileBatch):
+    """Batch of AudioFileFound events"""
+
+
+class AudioFileGainsUpdated(AudioFileBatch):
+    """Batch of AudioFileGainUpdated events"""
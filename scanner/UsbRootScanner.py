@@ -1,12 +1,21 @@
 import json
 import os
 import sys
+import time
 from enum import Enum
+from functools import partial
 from pathlib import Path
+from threading import Event, Lock, Thread
 from time import sleep
+from typing import Iterator, Optional
 
-from scanner.Scan import get_gain_level, get_sha1_hash
-from scanner.ScannerEvents import ScannerEventHandler, RootPathRemoved, AudioFileFound, RootPathAppeared
+from scanner.AnalysisPool import AnalysisPool
+from scanner.GainCache import GainCache, GainCacheEntry, get_filesystem_uuid
+from scanner.GainIndex import GainIndex
+from scanner.MountWatcher import MountWatcher
+from scanner.Scan import analyze_file, get_fingerprint, get_tagged_loudness, is_fingerprint, resolve_known_gain
+from scanner.ScannerEvents import ScannerEventHandler, RootPathRemoved, AudioFileFound, RootPathAppeared, \
+    AudioFileGainUpdated, ScannerEvent
 
 
 class AvailabilityChange(Enum):
@@ -56,15 +65,63 @@ class RootPath:
                 return AvailabilityChange.NO_CHANGE
 
 
+class RootScan:
+    """
+    A single scan of a root path, which can be cancelled from other threads.
+    Once cancel returns, the scan doesn't emit any more events, so a RootPathRemoved emitted afterwards is really the
+    last event for the root path.
+    """
+    root_path: RootPath
+    cancelled: Event
+    next_availability_check: float = 0.0
+
+    __event_handler: ScannerEventHandler
+    __lock: Lock
+    __thread: Optional[Thread] = None
+
+    def __init__(self, root_path: RootPath, event_handler: ScannerEventHandler):
+        self.root_path = root_path
+        self.cancelled = Event()
+        self.__event_handler = event_handler
+        self.__lock = Lock()
+
+    def emit(self, event: ScannerEvent):
+        with self.__lock:
+            if not self.cancelled.is_set():
+                self.__event_handler.handle_scanner_event(event)
+
+    def cancel(self):
+        with self.__lock:
+            self.cancelled.set()
+
+    def start(self, target):
+        """Runs the scan in its own thread"""
+        self.__thread = Thread(target=target, args=(self,), name="scan " + self.root_path.path.__str__(), daemon=True)
+        self.__thread.start()
+
+
 class Scanner:
     """
     Scans root paths and emits events that describe the result of the audio file scanning.
 
     Attributes:
-        root_paths          The root paths to scan. These are the mount points of the thumbdrives.
-                            Default values are the mountpoints the package "usbmount" uses.
+        root_paths          The root paths to poll if there's no mount watcher. These are the mount points of the
+                            thumbdrives. Default values are the mountpoints the package "usbmount" uses.
+        mount_watcher       Reports thumbdrives as they are mounted and unmounted. None falls back to polling the
+                            root paths.
         audio_extensions    The file extensions we check for audio file content
         event_handler       The event handler that receives the events this scanner emits
+        worker_count        Number of files analyzed in parallel, defaults to the number of cores
+        ordered_results     Whether found files are emitted in the order of the drive's walk. Otherwise they are emitted
+                            as soon as their analysis is done, which doesn't hold fast files back behind slow ones.
+        availability_check_interval Seconds between the checks whether the scanned root path is still available
+        gain_cache          Persistent cache of the analysis results, files found in it are neither hashed nor
+                            decoded. None disables caching.
+        safe_gain_level     Provisional gain level of files without loudness tags. It's the level of a very loud
+                            file, so an unknown file rather plays too quiet than too loud until it's analyzed.
+        min_tagged_gain_level   Lower limit for gain levels from tags, since tags may be wrong and a low gain level
+                            means a high amplification
+        lookup_batch_size   Number of fingerprints looked up in a gain index at once
 
     """
 
@@ -87,15 +144,89 @@ class Scanner:
     ]
 
     event_handler: ScannerEventHandler
+    mount_watcher: Optional[MountWatcher] = None
+    worker_count: Optional[int] = None
+    ordered_results: bool = False
+    availability_check_interval: float = 5.0
+    gain_cache: Optional[GainCache] = None
+    safe_gain_level: float = -5.0
+    min_tagged_gain_level: float = -20.0
+    lookup_batch_size: int = 256
 
-    def __init__(self, event_handler: ScannerEventHandler):
+    __pool: Optional[AnalysisPool] = None
+    __scans: {str: RootScan}
+
+    def __init__(self, event_handler: ScannerEventHandler, worker_count: Optional[int] = None,
+                 ordered_results: bool = False, gain_cache: Optional[GainCache] = None,
+                 mount_watcher: Optional[MountWatcher] = None):
         self.event_handler = event_handler
+        self.mount_watcher = mount_watcher
+        self.__scans = {}
+        self.worker_count = worker_count
+        self.ordered_results = ordered_results
+        self.gain_cache = gain_cache
+
+    def __get_pool(self) -> AnalysisPool:
+        # Created on first use, so the pool's threads are started in the worker process
+        if self.__pool is None:
+            self.__pool = AnalysisPool(self.worker_count, self.ordered_results)
+        return self.__pool
+
+    def cancel_scan(self):
+        """
+        Stops all running scans after the files currently being analyzed. Safe to call from other threads.
+        :return: None
+        """
+        for scan in list(self.__scans.values()):
+            scan.cancel()
 
     def work_loop(self):
         """
-        Scans all root paths for availability every 5 seconds.
-        If a new root path becomes available, it's scanned recursively. In this case the time between successive
-        checks of a given root path is prolongued by the time to scan the new root path.
+        Waits for root paths to appear or disappear. Every new root path is scanned recursively in its own thread,
+        while the scanner keeps watching the others. A scan is cancelled as soon as its root path disappears.
+        With a mount watcher the scanner sleeps until the mount table changes, otherwise it polls the root paths.
+        :return: None
+        """
+        if self.mount_watcher is not None:
+            self.__watch_mounts()
+        else:
+            self.__poll_root_paths()
+
+    def __root_path_appeared(self, root_path: RootPath):
+        self.__root_path_removed(root_path, emit=False)
+        self.event_handler.handle_scanner_event(RootPathAppeared(root_path.path))
+        scan = RootScan(root_path, self.event_handler)
+        self.__scans[root_path.path.__str__()] = scan
+        scan.start(self.__run_scan)
+
+    def __root_path_removed(self, root_path: RootPath, emit: bool = True):
+        scan = self.__scans.pop(root_path.path.__str__(), None)
+        if scan is not None:
+            scan.cancel()
+        if emit:
+            self.event_handler.handle_scanner_event(RootPathRemoved(root_path.path))
+
+    def __run_scan(self, scan: RootScan):
+        try:
+            self.scan_path(scan.root_path, scan)
+        except:
+            sys.stderr.write("Error scanning root path: " + scan.root_path.path.__str__() + "\n")
+
+    def __watch_mounts(self):
+        """
+        Emits events for the mount points the watcher reports and starts or cancels their scans.
+        :return: None
+        """
+        while True:
+            appeared, removed = self.mount_watcher.wait_for_changes()
+            for path in removed:
+                self.__root_path_removed(RootPath(path))
+            for path in appeared:
+                self.__root_path_appeared(RootPath(path))
+
+    def __poll_root_paths(self):
+        """
+        Scans all root paths for availability every 5 seconds and starts or cancels their scans.
         :return: None
         """
         while True:
@@ -104,49 +235,225 @@ class Scanner:
                 if change == AvailabilityChange.NO_CHANGE:
                     continue
                 elif change == AvailabilityChange.DISAPPEARED:
-                    self.event_handler.handle_scanner_event(RootPathRemoved(rp.path))
+                    self.__root_path_removed(rp)
                 elif change.APPEARED:
-                    self.event_handler.handle_scanner_event(RootPathAppeared(rp.path))
-                    self.scan_path(rp)
+                    self.__root_path_appeared(rp)
             sleep(5)
 
-    def scan_path(self, root_path: RootPath):
+    def scan_path(self, root_path: RootPath, scan: Optional[RootScan] = None):
         """
         Recusrively scans all files on a root path for audio content.
         If a file is likely an audio file, its gain level is determined and an event is fired to broadcast its
         availability.
+
+        This happens in two passes, so a new drive becomes playable right away. The first pass only looks at the
+        gain cache, the fingerprints in the drive's gain database and the files' tags and emits every file with the
+        gain level it finds there, or a safe provisional one. The second pass analyzes the files whose gain level
+        isn't final yet and emits AudioFileGainUpdated for them. Both passes run in the scanner's analysis pool, which
+        is shared by the scans of all root paths.
         :param root_path: The root path to scan
-        :return: None. As a side effect AudioFileFound might be emitted
+        :param scan: The scan to emit the events through and to check for cancellation, a new one if None
+        :return: None. As a side effect AudioFileFound and AudioFileGainUpdated might be emitted
         """
 
         # check to see if there is a gain database on the root path
-        gain_db: {str: float} = {}
+        gain_db = self.__load_gain_database(root_path)
+
+        # Files are only known to the cache if we can tell which drive they're on
+        filesystem_uuid = None
+        cached: {str: GainCacheEntry} = {}
+        if self.gain_cache is not None:
+            filesystem_uuid = get_filesystem_uuid(root_path.path)
+            if filesystem_uuid is not None:
+                cached = self.gain_cache.load(filesystem_uuid)
+        stats: {str: os.stat_result} = {}
+
+        # Prescanned drives may know their files by fingerprint, by SHA1 hash or both. The fingerprint is preferred,
+        # since it doesn't need to read the whole file. Without a gain database it still serves as key for the cache.
+        if isinstance(gain_db, GainIndex):
+            fingerprints_known = gain_db.get_fingerprint_count() > 0
+            hashes_known = gain_db.get_hash_count() > 0
+        else:
+            fingerprints_known = any(is_fingerprint(key) for key in gain_db)
+            hashes_known = any(not is_fingerprint(key) for key in gain_db)
+        use_fingerprint = fingerprints_known or not hashes_known
+
+        if scan is None:
+            scan = RootScan(root_path, self.event_handler)
+        pool = self.__get_pool()
+        scan.next_availability_check = time.monotonic() + self.availability_check_interval
+
+        try:
+            # First pass: make everything playable
+            provisional: [(str, [str])] = []
+            files = self.__find_uncached_audio_files(scan, filesystem_uuid, cached, stats)
+            if isinstance(gain_db, GainIndex) and use_fingerprint:
+                results = self.__resolve_batched(scan, pool, files, gain_db)
+            else:
+                resolve = partial(resolve_known_gain, gain_db=gain_db, use_fingerprint=use_fingerprint)
+                results = pool.map(resolve, files, scan.cancelled)
+            for absolute_path, result in results:
+                if isinstance(result, Exception):
+                    result = ([], None, False)
+                keys, gain, final = result
+                if final:
+                    scan.emit(AudioFileFound(Path(absolute_path), gain))
+                    self.__store(root_path, filesystem_uuid, absolute_path, stats.pop(absolute_path, None), keys,
+                                 gain)
+                else:
+                    if gain is None:
+                        gain = self.safe_gain_level
+                    gain = max(self.min_tagged_gain_level, gain)
+                    scan.emit(AudioFileFound(Path(absolute_path), gain))
+                    provisional.append((absolute_path, keys))
+                self.__check_availability(scan)
+
+            if scan.cancelled.is_set() or pool.is_cancelled():
+                return
+
+            # Second pass: analyze what's only playing with a provisional gain level
+            keys_by_path = dict(provisional)
+            analyze = partial(analyze_file, gain_db=gain_db, use_fingerprint=False, use_sha1=hashes_known)
+            for absolute_path, result in pool.map(analyze, (path for path, _ in provisional), scan.cancelled):
+                if isinstance(result, Exception):
+                    sys.stderr.write("Error scanning " + absolute_path.__str__() + ": " + result.__str__() + "\n")
+                elif result[1] is None:
+                    sys.stderr.write("Could not get gain info for " + absolute_path.__str__() + "\n")
+                else:
+                    scan.emit(AudioFileGainUpdated(Path(absolute_path), result[1]))
+                    self.__store(root_path, filesystem_uuid, absolute_path, stats.pop(absolute_path, None),
+                                 keys_by_path[absolute_path] + result[0], result[1])
+                self.__check_availability(scan)
+        finally:
+            if self.gain_cache is not None:
+                self.gain_cache.commit()
+
+    def __resolve_batched(self, scan: RootScan, pool: AnalysisPool, files: Iterator[str],
+                          gain_db: GainIndex) -> Iterator[tuple]:
+        """
+        Does the same as resolve_known_gain in the pool, but looks up the fingerprints of a batch of files in the gain
+        index at once. Only the files that aren't in it have their tags read.
+        :return: Tuples of the path and the result of resolve_known_gain or an Exception, like AnalysisPool.map
+        """
+        batch: [(str, Optional[str])] = []
+        for absolute_path, key in pool.map(get_fingerprint, files, scan.cancelled):
+            batch.append((absolute_path, key if isinstance(key, str) else None))
+            if len(batch) >= self.lookup_batch_size:
+                yield from self.__resolve_batch(scan, pool, batch, gain_db)
+                batch = []
+        yield from self.__resolve_batch(scan, pool, batch, gain_db)
+
+    @staticmethod
+    def __resolve_batch(scan: RootScan, pool: AnalysisPool, batch: [(str, Optional[str])],
+                        gain_db: GainIndex) -> Iterator[tuple]:
+        keys_by_path: {str: [str]} = {}
+        for (absolute_path, key), gain in zip(batch, gain_db.get_many([key for _, key in batch])):
+            keys = [key] if key is not None else []
+            if gain is not None:
+                yield absolute_path, (keys, gain, True)
+            else:
+                keys_by_path[absolute_path] = keys
+        for absolute_path, loudness in pool.map(get_tagged_loudness, keys_by_path, scan.cancelled):
+            if isinstance(loudness, Exception):
+                yield absolute_path, loudness
+            else:
+                yield absolute_path, (keys_by_path[absolute_path], loudness, False)
+
+    @staticmethod
+    def __load_gain_database(root_path: RootPath):
+        """
+        Loads the binary gain index of a root path, or its JSON gain database if there's no index or the JSON
+        database has been written after it, e.g. by a prescan without index or by another tool.
+        The index is read instead of mapped, since a mapping turns pulling the drive into a crash. Reading it takes
+        a single sequential read without any parsing, and the scan looks up nearly every entry anyway.
+        :param root_path: The root path
+        :return: The gain levels by key as GainIndex or dict, which is empty if there's no gain database
+        """
+        index_path = root_path.path / GainIndex.file_name
+        gain_db_path = root_path.path / "gain_database.json"
+        try:
+            index_mtime = os.stat(index_path).st_mtime_ns
+            try:
+                stale = os.stat(gain_db_path).st_mtime_ns > index_mtime
+            except FileNotFoundError:
+                stale = False
+            if stale:
+                sys.stderr.write("Gain index of " + root_path.path.__str__() + " is older than its gain database, " +
+                                 "ignoring it\n")
+            else:
+                return GainIndex.open(index_path, memory_map=False)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            sys.stderr.write("Error loading the gain index of " + root_path.path.__str__() + ": " + e.__str__() + "\n")
+
         try:
-            gain_db_path = os.path.join(root_path.path, "gain_database.json")
             with open(gain_db_path, 'r') as file_handle:
-                gain_db = json.load(file_handle)
+                return json.load(file_handle)
         except:
-            pass
+            return {}
+
+    def __store(self, root_path: RootPath, filesystem_uuid: Optional[str], absolute_path: str,
+                stat_result: Optional[os.stat_result], keys: [str], gain: float):
+        """Adds a final gain level to the gain cache, if the file can be identified"""
+        if filesystem_uuid is not None and stat_result is not None and keys:
+            entry = GainCacheEntry(stat_result.st_size, stat_result.st_mtime_ns, keys[0], gain)
+            self.gain_cache.store(filesystem_uuid, os.path.relpath(absolute_path, root_path.path), entry)
+
+    def __check_availability(self, scan: RootScan):
+        """Cancels the scan if the drive was pulled, the work loop reports its removal"""
+        if time.monotonic() < scan.next_availability_check:
+            return
+        scan.next_availability_check = time.monotonic() + self.availability_check_interval
+        try:
+            available = bool(os.listdir(scan.root_path.path))
+        except:
+            available = False
+        if not available:
+            sys.stderr.write("Root path " + scan.root_path.path.__str__() + " disappeared while scanning\n")
+            scan.cancel()
+
+    def __find_uncached_audio_files(self, scan: RootScan, filesystem_uuid: Optional[str],
+                                    cached: {str: GainCacheEntry}, stats: {str: os.stat_result}) -> Iterator[str]:
+        """
+        Emits AudioFileFound for the files whose cache entries are still valid and returns the others for analysis
+        :param scan: The scan of the root path to walk
+        :param filesystem_uuid: The UUID of the root path's filesystem, None if the cache isn't used
+        :param cached: The cache entries of the root path's filesystem by relative path
+        :param stats: Receives the stat of each returned file, for storing its analysis result in the cache
+        :return: Iterator over the absolute paths of the audio files that need to be analyzed
+        """
+        root_path = scan.root_path
+        for absolute_path in self.__find_audio_files(root_path):
+            if filesystem_uuid is None:
+                yield absolute_path
+                continue
 
-        for (dir_path, dirs, files) in os.walk(topdown=True, followlinks=False, top=root_path.path):
-            for file in files:
-                absolute_path = os.path.join(dir_path, file)
+            try:
+                stat_result = os.stat(absolute_path)
+            except OSError:
+                yield absolute_path
+                continue
+
+            entry = cached.get(os.path.relpath(absolute_path, root_path.path))
+            if entry is not None and entry.matches(stat_result):
+                scan.emit(AudioFileFound(Path(absolute_path), entry.gain))
+            else:
+                stats[absolute_path] = stat_result
+                yield absolute_path
 
-                try:
+    def __find_audio_files(self, root_path: RootPath) -> Iterator[str]:
+        """
+        Walks a root path lazily, so the analysis starts with the first files while the rest of the drive is walked.
+        :param root_path: The root path to walk
+        :return: Iterator over the absolute paths of the files with an audio extension
+        """
+        try:
+            for (dir_path, dirs, files) in os.walk(topdown=True, followlinks=False, top=root_path.path):
+                for file in files:
                     # Get the extension
                     ext = os.path.splitext(file)[-1].lower()
                     if ext in self.audio_extensions:
-                        # Get the hash and see if we have a gain value in the db already
-                        hash = get_sha1_hash(absolute_path)
-                        if hash in gain_db:
-                            self.event_handler.handle_scanner_event(AudioFileFound(Path(absolute_path), gain_db[hash]))
-                            continue
-
-                        # If we don't have a gain value, we just calculate it
-                        gain = get_gain_level(absolute_path)
-                        if gain is None:
-                            sys.stderr.write("Could not get gain info for " + absolute_path.__str__() + "\n")
-                        else:
-                            self.event_handler.handle_scanner_event(AudioFileFound(Path(absolute_path), gain))
-                except:
-                    sys.stderr.write("Error scanning root path: " + root_path.path.__str__())
+                        yield os.path.join(dir_path, file)
+        except:
+            sys.stderr.write("Error scanning root path: " + root_path.path.__str__() + "\n")